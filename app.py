@@ -1,35 +1,109 @@
 import streamlit as st
-import asyncio
-from scrype import generate_pdf_from_indices, get_url_from_csv
+from scrype import get_urls_from_csv
+from jobs import get_job_queue
+from catalog import parse_indices, parse_index_file, decode_catalog
+from cache import get_cache
+from tracing import get_tracer, summarize_trace
 import base64
 import os
+import threading
 import uuid
-
-
-# Funkcja uruchamiająca generowanie PDF na podstawie indeksów
-def run_pdf_generation(indices, file_name):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    result = loop.run_until_complete(generate_pdf_from_indices(indices, file_name))
-    loop.close()
-    return result
-
-
-# Funkcja do wyświetlania pliku PDF
-def show_pdf(file_path):
-    if os.path.exists(file_path):  # Sprawdzenie, czy plik istnieje
-        with open(file_path, "rb") as f:
-            base64_pdf = base64.b64encode(f.read()).decode('utf-8')
-        pdf_display = f'''
-            <div style="display: flex; justify-content: center; align-items: center; height: 73vh;">
-                <iframe src="data:application/pdf;base64,{base64_pdf}#toolbar=0&navpanes=0&scrollbar=0"
-                        width="619"
-                        height="850"
-                        style="border: none;">
-                </iframe>
-            </div>
-        '''
-        st.markdown(pdf_display, unsafe_allow_html=True)
+from collections import OrderedDict, namedtuple
+
+# Limity pamięci na wygenerowane dokumenty (wspólne dla wszystkich sesji):
+# liczba dokumentów i ich łączny rozmiar w MB
+PDF_STORE_ITEMS = int(os.getenv("PDF_STORE_ITEMS", "32"))
+PDF_STORE_MB = float(os.getenv("PDF_STORE_MB", "256"))
+# Co ile sekund odświeżany jest postęp generowania
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+# Panel diagnostyczny z czasami etapów - włączany zmienną DEBUG_PANEL=1 lub adresem ?debug=1
+DEBUG_PANEL = os.getenv("DEBUG_PANEL", "") == "1"
+
+# Opisy danych zastąpionych w etykietach przygotowanych w trybie awaryjnym
+DEGRADED_REASONS = {
+    "product": "ostatnie zapisane dane produktu (sklep nie odpowiada)",
+    "summary": "skrócony opis zamiast podsumowania (OpenAI nie odpowiada)",
+    "image": "etykieta bez zdjęcia (nie udało się pobrać zdjęcia)",
+    "label": "ostatnia zapisana etykieta"
+}
+
+# Wygenerowany dokument: bajty PDF, nazwa pliku do pobrania i gotowy kod HTML podglądu
+StoredPdf = namedtuple("StoredPdf", ["data", "file_name", "preview_html"])
+
+
+# Funkcja zwracająca pamięć zajmowaną przez dokument - bajty PDF i podgląd (kopia base64, ok. 1,33 rozmiaru PDF)
+def document_size(document):
+    return len(document.data) + len(document.preview_html)
+
+
+# Magazyn wygenerowanych PDF w pamięci procesu (LRU) - najstarsze dokumenty są usuwane po przekroczeniu limitów.
+# Limit PDF_STORE_MB obejmuje bajty PDF razem z kodem HTML podglądu.
+class PdfStore:
+    def __init__(self, max_items=PDF_STORE_ITEMS, max_bytes=int(PDF_STORE_MB * 1024 * 1024)):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put(self, data, file_name):
+        document = StoredPdf(data, file_name, build_preview_html(data))
+        document_id = uuid.uuid4().hex
+        with self._lock:
+            self._items[document_id] = document
+            self._size += document_size(document)
+            while len(self._items) > 1 and (len(self._items) > self.max_items or self._size > self.max_bytes):
+                _, removed = self._items.popitem(last=False)
+                self._size -= document_size(removed)
+        return document_id
+
+    def get(self, document_id):
+        with self._lock:
+            document = self._items.get(document_id)
+            if document is not None:
+                self._items.move_to_end(document_id)
+            return document
+
+    def discard(self, document_id):
+        with self._lock:
+            document = self._items.pop(document_id, None)
+            if document is not None:
+                self._size -= document_size(document)
+
+
+# Funkcja zwracająca magazyn dokumentów współdzielony przez wszystkie sesje
+@st.cache_resource
+def get_pdf_store():
+    return PdfStore()
+
+
+# Funkcja budująca kod HTML podglądu PDF (kodowanie base64 wykonywane raz na dokument)
+def build_preview_html(pdf_data):
+    base64_pdf = base64.b64encode(pdf_data).decode('utf-8')
+    return f'''
+        <div style="display: flex; justify-content: center; align-items: center; height: 73vh;">
+            <iframe src="data:application/pdf;base64,{base64_pdf}#toolbar=0&navpanes=0&scrollbar=0"
+                    width="619"
+                    height="850"
+                    style="border: none;">
+            </iframe>
+        </div>
+    '''
+
+
+# Funkcja zwracająca podgląd pustego szablonu (plik czytany raz na proces)
+@st.cache_data
+def load_blank_preview(file_path="blank.pdf"):
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, "rb") as f:
+        return build_preview_html(f.read())
+
+
+# Funkcja do wyświetlania podglądu PDF
+def show_pdf(preview_html):
+    if preview_html:
+        st.markdown(preview_html, unsafe_allow_html=True)
     else:
         st.error("Plik PDF nie został znaleziony.")
 
@@ -42,12 +116,22 @@ def initialize_session():
         st.session_state["is_generating"] = False
     if "reset_app" not in st.session_state:
         st.session_state.reset_app = False
-    if "generated_file" not in st.session_state:
-        st.session_state.generated_file = ""
+    if "document_id" not in st.session_state:
+        st.session_state.document_id = ""
     if "file_downloaded" not in st.session_state:
         st.session_state.file_downloaded = False
     if "show_error" not in st.session_state:
         st.session_state.show_error = False
+    if "failures" not in st.session_state:
+        st.session_state.failures = {}
+    if "degraded" not in st.session_state:
+        st.session_state.degraded = {}
+    if "trace_id" not in st.session_state:
+        st.session_state.trace_id = ""
+    if "job_id" not in st.session_state:
+        st.session_state.job_id = ""
+    if "generation_error" not in st.session_state:
+        st.session_state.generation_error = ""
 
 
 # Funkcja do resetowania stanu sesji
@@ -64,39 +148,89 @@ def reset_session_state():
     st.session_state["index2"] = ""
     st.session_state["index3"] = ""
     st.session_state["index4"] = ""
+    st.session_state["batch_indices"] = ""
 
 
-# Funkcja do usuwania pliku PDF
-def delete_pdf_file(file_path):
-    try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    except Exception as e:
-        print(f"Błąd podczas usuwania pliku: {e}")
+# Funkcja odczytująca indeksy z pola tekstowego i przesłanego pliku CSV (tryb wsadowy)
+def read_batch_indices(text, uploaded_file):
+    indices = parse_indices(text or "")
+    if uploaded_file is not None:
+        content, _ = decode_catalog(uploaded_file.getvalue())
+        if content:
+            indices.extend(parse_index_file(content))
+    return indices
 
 
 # Funkcja sprawdzająca czy wszystkie indeksy są niepoprawne
 def validate_indices(indices):
     valid_indices_count = 0
-    for index in indices:
-        url, pic_url = get_url_from_csv(index)
+    for url, pic_url in get_urls_from_csv(indices).values():
         if url is not None and pic_url is not None:
             valid_indices_count += 1
     return valid_indices_count > 0  # Zwraca True jeśli jest przynajmniej jeden poprawny indeks
 
 
-# Funkcja sprawdzająca czy generowanie PDF się powiodło
-def check_pdf_generation(file_path):
-    return os.path.exists(file_path) and os.path.getsize(file_path) > 0
-
-
-# Funkcja obsługująca pobranie pliku
+# Funkcja obsługująca pobranie pliku - dokument nie jest już potrzebny w pamięci
 def handle_download():
-    if st.session_state.generated_file:
-        delete_pdf_file(st.session_state.generated_file)
+    if st.session_state.document_id:
+        get_pdf_store().discard(st.session_state.document_id)
     st.session_state.file_downloaded = True
 
 
+# Funkcja odbierająca wynik zakończonego zadania generowania i zapisująca dokument w magazynie
+def collect_job_result(job):
+    st.session_state["job_id"] = ""
+    st.session_state["is_generating"] = False
+    if job is None:
+        st.session_state["generation_error"] = "❌ Zadanie generowania wygasło. Spróbuj ponownie."
+    elif job.status == "done" and job.result["data"]:
+        file_name = f"products_{uuid.uuid4()}.pdf"
+        st.session_state["document_id"] = get_pdf_store().put(job.result["data"], file_name)
+        st.session_state["failures"] = job.result["failures"]
+        st.session_state["degraded"] = job.result["degraded"]
+        st.session_state["trace_id"] = job.result["trace_id"]
+        st.session_state["pdf_generated"] = True
+    else:
+        st.session_state["generation_error"] = "❌ Wystąpił błąd podczas generowania pliku PDF."
+
+
+# Fragment odświeżany cyklicznie: postęp zadania; po jego zakończeniu przeładowywana jest cała strona
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_job_progress():
+    job = get_job_queue().get(st.session_state.job_id)
+    if job is None or job.finished:
+        st.rerun()
+    elif job.status == "queued":
+        st.info(f"⏳ Oczekiwanie w kolejce (zadań w kolejce: {get_job_queue().pending()})...")
+    else:
+        st.progress(job.done / job.total if job.total else 0.0,
+                    text=f"Trwa generowanie pliku PDF... ({job.done} z {job.total} etykiet)")
+
+
+# Funkcja wyświetlająca panel diagnostyczny: etapy ostatniego generowania, statystyki procesu i metryki
+def show_debug_panel():
+    tracer = get_tracer()
+    with st.expander("🛠️ Panel diagnostyczny", expanded=False):
+        last = next((item for item in tracer.recent_traces() if item["id"] == st.session_state.trace_id), None)
+        if last is not None:
+            st.markdown(f"**Ostatnie generowanie** ({last['indices']} indeksów): {last['duration_ms'] / 1000:.2f} s")
+            st.caption("Łączny czas etapów współbieżnych może przekraczać czas całego generowania.")
+            st.dataframe(summarize_trace(last), use_container_width=True, hide_index=True)
+
+        st.markdown("**Etapy - wszystkie sesje od uruchomienia serwera**")
+        st.dataframe(tracer.stage_stats(), use_container_width=True, hide_index=True)
+
+        st.markdown("**Pamięć podręczna**")
+        st.json(get_cache().stats(), expanded=False)
+
+        st.download_button(
+            label="Pobierz metryki (Prometheus)",
+            data=tracer.prometheus(),
+            file_name="metrics.txt",
+            mime="text/plain"
+        )
+
+
 # Główna funkcja interfejsu użytkownika
 def main():
     # Konfiguracja strony
@@ -127,6 +261,12 @@ def main():
         initialize_session()
         st.session_state.reset_app = False
 
+    # Odbiór wyniku zadania generowania, jeśli zostało zakończone
+    if st.session_state.job_id:
+        job = get_job_queue().get(st.session_state.job_id)
+        if job is None or job.finished:
+            collect_job_result(job)
+
     # Wstawienie logo i pól do wprowadzania indeksów do paska bocznego
     st.sidebar.image("logo.png", use_container_width=True)
     st.sidebar.title("Generator etykiet Mat-Poż")
@@ -137,14 +277,24 @@ def main():
 
     if not st.session_state["pdf_generated"]:
         st.sidebar.divider()
-        st.sidebar.markdown(
-            "<p style='color:red;'>Wprowadź od 1 do 4 indeksów produktów, aby wygenerować etykietę PDF.</p>",
-            unsafe_allow_html=True)
-        st.sidebar.divider()
-        index1 = st.sidebar.text_input("Indeks produktu 1", key="index1")
-        index2 = st.sidebar.text_input("Indeks produktu 2", key="index2")
-        index3 = st.sidebar.text_input("Indeks produktu 3", key="index3")
-        index4 = st.sidebar.text_input("Indeks produktu 4", key="index4")
+        batch_mode = st.sidebar.toggle("Tryb wsadowy (wiele stron)", key="batch_mode")
+        if batch_mode:
+            st.sidebar.markdown(
+                "<p style='color:red;'>Wklej indeksy produktów (jeden w wierszu) lub prześlij plik CSV. "
+                "Etykiety zostaną ułożone po 4 na stronę A4.</p>",
+                unsafe_allow_html=True)
+            st.sidebar.divider()
+            batch_text = st.sidebar.text_area("Indeksy produktów", key="batch_indices", height=200)
+            batch_file = st.sidebar.file_uploader("Plik CSV z indeksami", type=["csv", "txt"], key="batch_file")
+        else:
+            st.sidebar.markdown(
+                "<p style='color:red;'>Wprowadź od 1 do 4 indeksów produktów, aby wygenerować etykietę PDF.</p>",
+                unsafe_allow_html=True)
+            st.sidebar.divider()
+            index1 = st.sidebar.text_input("Indeks produktu 1", key="index1")
+            index2 = st.sidebar.text_input("Indeks produktu 2", key="index2")
+            index3 = st.sidebar.text_input("Indeks produktu 3", key="index3")
+            index4 = st.sidebar.text_input("Indeks produktu 4", key="index4")
 
     # Pojemnik na komunikaty i podgląd PDF
     message_area = st.empty()
@@ -153,39 +303,35 @@ def main():
     # Wyświetlenie pustego PDF na początku
     if not st.session_state["pdf_generated"]:
         with pdf_display_area:
-            show_pdf("blank.pdf")
+            show_pdf(load_blank_preview())
 
     # Funkcja obsługująca kliknięcie przycisku generowania
     def handle_generate_pdf():
-        indices = [idx for idx in [index1, index2, index3, index4] if idx]
+        if batch_mode:
+            indices = read_batch_indices(batch_text, batch_file)
+        else:
+            indices = [idx for idx in [index1, index2, index3, index4] if idx]
         if indices:
-            st.session_state["is_generating"] = True
             # Sprawdzenie czy jest przynajmniej jeden poprawny indeks
             if validate_indices(indices):
-                with message_area:
-                    with st.spinner("Trwa generowanie pliku PDF..."):
-                        # Generowanie unikalnej nazwy pliku i generowanie PDF
-                        file_name = f"products_{uuid.uuid4()}.pdf"
-                        try:
-                            run_pdf_generation(indices, file_name)
-                            if check_pdf_generation(file_name):
-                                st.session_state["generated_file"] = file_name
-                                st.session_state["pdf_generated"] = True
-                            else:
-                                st.error("❌ Wystąpił błąd podczas generowania pliku PDF.")
-                                delete_pdf_file(file_name)
-                        except Exception as e:
-                            st.error("❌ Wystąpił błąd podczas generowania pliku PDF.")
-                            delete_pdf_file(file_name)
+                # Zadanie trafia do wspólnej kolejki - strona nie jest blokowana w trakcie generowania
+                st.session_state["job_id"] = get_job_queue().submit(indices)
+                st.session_state["is_generating"] = True
+                st.session_state["generation_error"] = ""
             else:
                 st.session_state.show_error = True
-            st.session_state["is_generating"] = False
 
     # Przycisk do generowania PDF lub komunikat o powodzeniu
     if not st.session_state["pdf_generated"]:
-        # Przycisk do generowania PDF
-        if st.sidebar.button("Generuj PDF", on_click=handle_generate_pdf):
-            st.session_state["is_generating"] = True
+        # Przycisk do generowania PDF (nieaktywny, dopóki trwa poprzednie zadanie)
+        st.sidebar.button("Generuj PDF", on_click=handle_generate_pdf, disabled=bool(st.session_state.job_id))
+
+        # Postęp zadania lub komunikat o błędzie generowania
+        with message_area:
+            if st.session_state.job_id:
+                show_job_progress()
+            elif st.session_state.generation_error:
+                st.error(st.session_state.generation_error)
 
         # Wyświetlanie komunikatu o błędzie i przycisku "SPRÓBUJ PONOWNIE"
         if st.session_state.show_error:
@@ -198,24 +344,39 @@ def main():
         # Po wygenerowaniu PDF pokazuje komunikat o powodzeniu
         st.sidebar.success("✅ Plik został wygenerowany!")
 
+        # Lista indeksów, dla których nie udało się przygotować etykiety
+        if st.session_state.failures:
+            with st.sidebar.expander(f"⚠️ Pominięte indeksy ({len(st.session_state.failures)})"):
+                for reference, reason in st.session_state.failures.items():
+                    st.markdown(f"- **{reference}**: {reason}")
+
+        # Etykiety przygotowane w trybie awaryjnym (sklep lub OpenAI nie odpowiadały w czasie)
+        if st.session_state.degraded:
+            with st.sidebar.expander(f"⚠️ Etykiety z niepełnymi danymi ({len(st.session_state.degraded)})"):
+                for reference, kinds in st.session_state.degraded.items():
+                    st.markdown(f"- **{reference}**: {', '.join(DEGRADED_REASONS.get(kind, kind) for kind in kinds)}")
+
+        document = get_pdf_store().get(st.session_state["document_id"])
+
         # Wyświetlenie wygenerowanego PDF
         with pdf_display_area:
-            show_pdf(st.session_state["generated_file"])
+            show_pdf(document.preview_html if document else None)
 
         # Przycisk pobierania
-        try:
-            if os.path.exists(st.session_state["generated_file"]):
-                with open(st.session_state["generated_file"], "rb") as pdf_file:
-                    pdf_data = pdf_file.read()
-                    st.sidebar.download_button(
-                        label="Pobierz wygenerowany PDF",
-                        data=pdf_data,
-                        file_name=st.session_state["generated_file"],
-                        mime="application/pdf",
-                        on_click=handle_download
-                    )
-        except Exception as e:
-            st.error("Wystąpił błąd podczas generowania pliku PDF.")
+        if document is not None:
+            st.sidebar.download_button(
+                label="Pobierz wygenerowany PDF",
+                data=document.data,
+                file_name=document.file_name,
+                mime="application/pdf",
+                on_click=handle_download
+            )
+        else:
+            # Dokument usunięty z pamięci (limit magazynu) - trzeba go wygenerować ponownie
+            st.error("Wygenerowany plik PDF wygasł. Wygeneruj go ponownie.")
+
+    if DEBUG_PANEL or st.query_params.get("debug") == "1":
+        show_debug_panel()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image
+
+from http_client import get_sync
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Katalog z przetworzonymi zdjęciami produktów (można go nadpisać zmienną IMAGE_CACHE_DIR)
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(BASE_DIR, 'image_cache'))
+# Rozdzielczość druku etykiet - zdjęcia są zmniejszane do tej gęstości pikseli
+LABEL_DPI = int(os.getenv("LABEL_DPI", "300"))
+# Czas (w sekundach), przez który zdjęcie z dysku jest używane bez sprawdzania ETag w sklepie
+IMAGE_TTL = float(os.getenv("IMAGE_TTL", str(24 * 3600)))
+# Liczba przetworzonych zdjęć trzymanych w pamięci procesu
+IMAGE_MEMORY_ITEMS = int(os.getenv("IMAGE_MEMORY_ITEMS", "64"))
+# Szerokość zdjęcia produktu na etykiecie (w mm) - połowa szerokości etykiety, czyli ćwiartki strony A4.
+# Określa rozmiar zdjęć w katalogu IMAGE_CACHE_DIR (pdf.py, scrype.py, catalog_sync.py).
+PRODUCT_IMAGE_WIDTH = 210 / 2 / 2
+
+# Przetworzone zdjęcie: zakodowane bajty (JPEG lub PNG) i wymiary w pikselach
+ImageAsset = namedtuple("ImageAsset", ["data", "width", "height"])
+
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+# Funkcja zwracająca zawartość pliku statycznego (logo, fonty) - odczyt raz na proces
+@lru_cache(maxsize=None)
+def get_static_asset(file_name):
+    with open(os.path.join(BASE_DIR, file_name), 'rb') as f:
+        return f.read()
+
+
+# Funkcja przeliczająca szerokość wydruku w mm na liczbę pikseli przy LABEL_DPI
+def width_mm_to_px(width_mm):
+    return max(1, round(width_mm / 25.4 * LABEL_DPI))
+
+
+# Funkcja zmniejszająca zdjęcie do docelowej szerokości i kodująca je ponownie
+def process_image(raw, width_px):
+    img = Image.open(BytesIO(raw))
+
+    # Mały JPEG nie wymaga przetwarzania - FPDF osadzi jego bajty bez ponownego kodowania
+    if img.format == "JPEG" and img.width <= width_px and img.mode in ("RGB", "L"):
+        return ImageAsset(raw, img.width, img.height)
+
+    if img.width > width_px:
+        height_px = max(1, round(img.height * width_px / img.width))
+        img = img.resize((width_px, height_px), Image.LANCZOS)
+
+    out = BytesIO()
+    if img.mode in ("RGBA", "LA", "P", "PA"):
+        # Zdjęcia z przezroczystością zapisujemy jako PNG
+        img.convert("RGBA").save(out, format="PNG", optimize=True)
+    else:
+        img.convert("RGB").save(out, format="JPEG", quality=90, optimize=True)
+    return ImageAsset(out.getvalue(), img.width, img.height)
+
+
+def _url_key(url, width_px):
+    return hashlib.sha256(f"{url}|{width_px}".encode('utf-8')).hexdigest()
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_meta(meta_path, meta):
+    _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+
+
+def _load_from_disk(meta):
+    try:
+        with open(os.path.join(IMAGE_CACHE_DIR, meta["file"]), 'rb') as f:
+            return ImageAsset(f.read(), meta["width"], meta["height"])
+    except (OSError, KeyError):
+        return None
+
+
+def _remember(key, asset):
+    with _memory_lock:
+        _memory[key] = asset
+        _memory.move_to_end(key)
+        while len(_memory) > IMAGE_MEMORY_ITEMS:
+            _memory.popitem(last=False)
+
+
+# Pobranie zdjęcia (lub potwierdzenie ETag), przetworzenie i zapis na dysk; limity czasu, ponowienia
+# i bezpiecznik hosta zapewnia http_client.get_sync
+def _fetch(url, width_px, key, meta):
+    headers = {}
+    if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+
+    response = get_sync(url, headers=headers)
+    meta_path = os.path.join(IMAGE_CACHE_DIR, f"{key}.json")
+
+    if response.status_code == 304 and meta:
+        asset = _load_from_disk(meta)
+        if asset is not None:
+            meta["checked_at"] = time.time()
+            _write_meta(meta_path, meta)
+            return asset
+
+    response.raise_for_status()
+    asset = process_image(response.content, width_px)
+    etag = response.headers.get("ETag", "")
+    extension = "jpg" if asset.data[:2] == b"\xff\xd8" else "png"
+    file_name = f"{hashlib.sha256(f'{key}|{etag}'.encode('utf-8')).hexdigest()}.{extension}"
+
+    os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+    _write_atomic(os.path.join(IMAGE_CACHE_DIR, file_name), asset.data)
+    _write_meta(meta_path, {
+        "url": url,
+        "etag": etag,
+        "file": file_name,
+        "width": asset.width,
+        "height": asset.height,
+        "checked_at": time.time()
+    })
+
+    # Usunięcie poprzedniej wersji zdjęcia, jeśli sklep zwrócił nowy ETag
+    if meta and meta.get("file") and meta["file"] != file_name:
+        try:
+            os.remove(os.path.join(IMAGE_CACHE_DIR, meta["file"]))
+        except OSError:
+            pass
+    return asset
+
+
+# Usunięcie zdjęcia z pamięci podręcznej (pamięć procesu i dysk), np. po zmianie zdjęcia w katalogu;
+# zwraca True, jeśli zdjęcie było zapisane na dysku
+def invalidate_image(url, width_mm):
+    key = _url_key(url, width_mm_to_px(width_mm))
+    with _memory_lock:
+        _memory.pop(key, None)
+
+    meta_path = os.path.join(IMAGE_CACHE_DIR, f"{key}.json")
+    meta = _read_meta(meta_path)
+    paths = [meta_path]
+    if meta and meta.get("file"):
+        paths.append(os.path.join(IMAGE_CACHE_DIR, meta["file"]))
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return meta is not None
+
+
+# Funkcja zwracająca zdjęcie produktu przygotowane do druku o szerokości width_mm
+def get_product_image(url, width_mm):
+    width_px = width_mm_to_px(width_mm)
+    key = _url_key(url, width_px)
+
+    with _memory_lock:
+        asset = _memory.get(key)
+        if asset is not None:
+            _memory.move_to_end(key)
+            return asset
+
+    meta = _read_meta(os.path.join(IMAGE_CACHE_DIR, f"{key}.json"))
+    asset = None
+    if meta and time.time() - meta.get("checked_at", 0) <= IMAGE_TTL:
+        asset = _load_from_disk(meta)
+
+    if asset is None:
+        try:
+            asset = _fetch(url, width_px, key, meta)
+        except Exception as e:
+            print(f"Błąd podczas pobierania zdjęcia {url}: {e}")
+            # W razie problemów z siecią używamy ostatniej zapisanej wersji
+            asset = _load_from_disk(meta) if meta else None
+            if asset is None:
+                return None
+
+    _remember(key, asset)
+    return asset
+
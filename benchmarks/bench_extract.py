@@ -0,0 +1,117 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Benchmark odczytu danych produktu ze strony: dotychczasowe parsowanie całej strony (html.parser)
+# w porównaniu z parsowaniem tylko obszaru produktu (SoupStrainer + lxml).
+# Użycie: python benchmarks/bench_extract.py --pages katalog_z_zapisanymi_stronami --repeat 20
+# Strony można zapisać np. poleceniem: curl -o strona1.html <adres produktu>
+
+
+# Funkcja tworząca stronę o budowie zbliżonej do strony produktu w sklepie (nagłówek, menu, skrypty, stopka)
+def synthetic_page(n):
+    menu = "".join(
+        f'<li class="category" id="category-{i}"><a class="dropdown-item" href="/kategoria-{i}">Kategoria {i}</a>'
+        f'<ul>{"".join(f"<li><a href=/k{i}-{j}>Podkategoria {j}</a></li>" for j in range(12))}</ul></li>'
+        for i in range(40)
+    )
+    scripts = "".join(f'<script type="text/javascript">var prestashop_{i} = {{"id": {i}, "x": "{"a" * 200}"}};</script>' for i in range(30))
+    related = "".join(
+        f'<article class="product-miniature"><a href="/p{i}"><img src="/img/{i}.jpg" alt="Produkt {i}"></a>'
+        f'<h3 class="h3 product-title">Produkt powiązany {i}</h3><span class="price">{i},99 zł</span></article>'
+        for i in range(24)
+    )
+    return f"""<!doctype html>
+<html lang="pl"><head><meta charset="utf-8"><title>Produkt {n}</title>{scripts}</head>
+<body id="product"><header id="header"><nav><ul id="top-menu">{menu}</ul></nav></header>
+<section id="wrapper"><div class="row"><div class="col-md-6"><img class="js-qv-product-cover" src="/img/{n}.jpg"></div>
+<div class="col-md-6"><h1 class="h1 product-detail-name">Gaśnica proszkowa GP-{n}x ABC z manometrem</h1>
+<div class="product-prices"><div class="product-price h5"><div class="current-price">
+<span itemprop="price" content="{n}.99">{n},99&nbsp;zł</span></div></div></div>
+<div class="product-information"><div class="product-description"><p>Opis produktu {n}. {"Gaśnica przeznaczona do gaszenia pożarów grup A, B i C. " * 30}</p>
+<ul>{"".join(f"<li>Parametr {i}: wartość {i}</li>" for i in range(15))}</ul></div>
+<div class="product-additional-info"><span>Index: IDX-{n}</span>
+<a href="/brand/{n}">Producent {n}</a></div></div></div></div>
+<section class="product-accessories">{related}</section></section>
+<footer id="footer">{"".join(f'<div class="links"><a href="/info/{i}">Informacja {i}</a></div>' for i in range(200))}</footer>
+{scripts}</body></html>""".encode("utf-8")
+
+
+# Funkcja wczytująca zapisane strony lub tworząca przykładowe, gdy katalog nie został podany
+def load_pages(pages_dir, count):
+    if pages_dir:
+        pages = []
+        for file_path in sorted(glob.glob(os.path.join(pages_dir, "*.htm*"))):
+            with open(file_path, "rb") as f:
+                pages.append(f.read())
+        return pages
+    return [synthetic_page(n) for n in range(count)]
+
+
+# Pomiar czasu (najlepsze powtórzenie) i szczytowego zużycia pamięci dla jednej metody
+def measure(parse, pages, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in pages:
+            parse(html)
+        timings.append(time.perf_counter() - start)
+
+    peak = 0
+    for html in pages:
+        tracemalloc.start()
+        parse(html)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        "ms_per_page": round(best / len(pages) * 1000, 3),
+        "pages_per_second": round(len(pages) / best, 1),
+        "peak_memory_kb": round(peak / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark odczytu danych produktu ze strony HTML.")
+    parser.add_argument("--pages", help="katalog z zapisanymi stronami produktów (*.html)")
+    parser.add_argument("--count", type=int, default=20, help="liczba przykładowych stron, gdy nie podano katalogu")
+    parser.add_argument("--repeat", type=int, default=10, help="liczba powtórzeń pomiaru")
+    args = parser.parse_args()
+
+    from bs4 import BeautifulSoup
+    from scrype import parse_product_page, extract_product_info, HTML_PARSER
+
+    pages = load_pages(args.pages, args.count)
+    if not pages:
+        parser.error(f"Nie znaleziono stron w katalogu {args.pages}.")
+
+    # Dotychczasowa metoda: pełne drzewo całej strony w czystym Pythonie
+    def legacy_parse(html):
+        return extract_product_info(BeautifulSoup(html, "html.parser"))
+
+    mismatches = sum(legacy_parse(html) != parse_product_page(html) for html in pages)
+    legacy = measure(legacy_parse, pages, args.repeat)
+    current = measure(parse_product_page, pages, args.repeat)
+
+    print(json.dumps({
+        "pages": len(pages),
+        "average_page_kb": round(sum(map(len, pages)) / len(pages) / 1024, 1),
+        "parser": HTML_PARSER,
+        "legacy": legacy,
+        "current": current,
+        "speedup": round(legacy["ms_per_page"] / current["ms_per_page"], 2),
+        "memory_ratio": round(legacy["peak_memory_kb"] / current["peak_memory_kb"], 2),
+        "mismatched_pages": mismatches
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main()
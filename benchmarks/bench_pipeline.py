@@ -0,0 +1,250 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Benchmark całego procesu generowania etykiet z lokalnym sklepem (shop_stub.py) i API OpenAI (mock_openai.py).
+# Każdy scenariusz działa w osobnym procesie z pustą pamięcią podręczną, aby wyniki i szczytowe RSS były porównywalne.
+# Użycie: python benchmarks/bench_pipeline.py --output wyniki.json
+#         python benchmarks/bench_pipeline.py --compare wyniki_poprzedni_commit.json
+
+
+# Funkcja zwracająca szczytowe zużycie pamięci procesu (RSS) w MB
+def peak_rss_mb():
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux podaje wartość w KB, macOS w bajtach
+        return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+        except (ImportError, AttributeError):
+            return None
+
+
+# Scenariusz: przepustowość wyszukiwania w katalogu (get_url_from_csv)
+def child_catalog(args):
+    from scrype import get_url_from_csv, get_urls_from_csv
+    from catalog import get_catalog
+
+    start = time.perf_counter()
+    references = get_catalog().references()
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(args.lookups):
+        get_url_from_csv(references[i % len(references)])
+    lookup_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    get_urls_from_csv(references[:400])
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "catalog_size": len(references),
+        "load_ms": round(load_seconds * 1000, 2),
+        "lookups_per_second": round(args.lookups / lookup_seconds),
+        "batch_400_ms": round(batch_seconds * 1000, 3)
+    }
+
+
+# Scenariusz: pełne generowanie PDF dla N etykiet - najpierw bez danych w pamięci podręcznej, potem ponownie
+def child_generate(args):
+    from scrype import generate_pdf_from_indices
+    from catalog import get_catalog
+
+    references = get_catalog().references()[:args.labels]
+    timings = {}
+    for run in ("cold", "warm"):
+        start = time.perf_counter()
+        result = asyncio.run(generate_pdf_from_indices(references, None))
+        timings[run] = time.perf_counter() - start
+
+    return {
+        "labels": result["labels"],
+        "pages": result["pages"],
+        "failures": len(result["failures"]),
+        "cold_seconds": round(timings["cold"], 3),
+        "warm_seconds": round(timings["warm"], 3),
+        "pdf_bytes": len(result["data"] or b"")
+    }
+
+
+# Scenariusz: czas renderowania strony (create_pdf_with_grid) dla danych przygotowanych wcześniej
+def child_render(args):
+    from scrype import generate_pdf_from_indices
+    from catalog import get_catalog
+    from pdf import create_pdf_with_grid, LABELS_PER_PAGE
+
+    references = get_catalog().references()[:args.labels]
+    asyncio.run(generate_pdf_from_indices(references, None, json_path="temp_product_data.json"))
+    with open("temp_product_data.json", "r", encoding="utf-8") as f:
+        products = json.load(f)
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        create_pdf_with_grid(products, None)
+        timings.append(time.perf_counter() - start)
+
+    pages = -(-len(products) // LABELS_PER_PAGE)
+    return {
+        "labels": len(products),
+        "pages": pages,
+        "ms_per_page": round(min(timings) / pages * 1000, 2),
+        "mean_ms_per_page": round(sum(timings) / len(timings) / pages * 1000, 2)
+    }
+
+
+CHILD_SCENARIOS = {"catalog": child_catalog, "generate": child_generate, "render": child_render}
+
+
+# Uruchomienie scenariusza w osobnym procesie z własnym katalogiem roboczym i pamięcią podręczną
+def run_scenario(name, extra_args, env):
+    with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as workdir:
+        child_env = dict(env, CACHE_PATH=os.path.join(workdir, "cache.sqlite3"),
+                         IMAGE_CACHE_DIR=os.path.join(workdir, "images"))
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", name, *extra_args],
+            cwd=workdir, env=child_env, capture_output=True, text=True
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Scenariusz {name} zakończył się błędem:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+# Funkcja opisująca stan repozytorium, aby wyniki można było przypisać do commita
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+# Funkcja spłaszczająca wyniki do postaci scenariusz.metryka -> wartość
+def flatten(results):
+    return {
+        f"{scenario}.{metric}": value
+        for scenario, metrics in results.items()
+        for metric, value in metrics.items()
+        if isinstance(value, (int, float))
+    }
+
+
+# Porównanie z wynikami zapisanymi dla innego commita
+def print_comparison(old_report, new_report):
+    old, new = flatten(old_report["results"]), flatten(new_report["results"])
+    print(f"\nPorównanie z {old_report.get('commit')} -> {new_report.get('commit')}:")
+    print(f"{'metryka':40} {'przed':>12} {'po':>12} {'zmiana':>9}")
+    for key in sorted(set(old) & set(new)):
+        change = f"{(new[key] - old[key]) / old[key] * 100:+.1f}%" if old[key] else ""
+        print(f"{key:40} {old[key]:>12} {new[key]:>12} {change:>9}")
+    if old_report.get("config") != new_report.get("config"):
+        print("Uwaga: wyniki uzyskano przy innej konfiguracji benchmarku.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generowania etykiet z lokalnym sklepem i API OpenAI.")
+    parser.add_argument("--sizes", default="1,4,400", help="liczby etykiet w scenariuszach generowania")
+    parser.add_argument("--source-catalog", default=os.path.join(ROOT_DIR, "url_list.csv"), help="katalog produktów")
+    parser.add_argument("--pages", help="katalog z zapisanymi stronami produktów (domyślnie strony przykładowe)")
+    parser.add_argument("--shop-latency", type=float, default=0.05, help="opóźnienie odpowiedzi sklepu (s)")
+    parser.add_argument("--openai-latency", type=float, default=0.5, help="opóźnienie odpowiedzi OpenAI (s)")
+    parser.add_argument("--render-labels", type=int, default=40, help="liczba etykiet w pomiarze renderowania")
+    parser.add_argument("--lookups", type=int, default=200000, help="liczba wyszukiwań w katalogu")
+    parser.add_argument("--repeat", type=int, default=5, help="liczba powtórzeń pomiaru renderowania")
+    parser.add_argument("--distinct-images", action="store_true",
+                        help="inne zdjęcie dla każdego produktu (realistyczne zużycie pamięci dużych partii)")
+    parser.add_argument("--pdf-memory-mb", type=float, help="limit pamięci dokumentu PDF (PDF_MEMORY_MB)")
+    parser.add_argument("--output", help="zapisz wyniki do pliku JSON")
+    parser.add_argument("--compare", help="porównaj z wynikami z pliku JSON")
+    parser.add_argument("--child", choices=sorted(CHILD_SCENARIOS), help=argparse.SUPPRESS)
+    parser.add_argument("--labels", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Proces scenariusza: komunikaty aplikacji są pomijane, na wyjście trafia tylko wynik JSON
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            result = CHILD_SCENARIOS[args.child](args)
+        result["peak_rss_mb"] = peak_rss_mb()
+        print(json.dumps(result))
+        return
+
+    from mock_openai import start_mock_openai
+    from shop_stub import start_shop_stub, write_stub_catalog
+
+    shop = start_shop_stub(pages_dir=args.pages, latency=args.shop_latency, distinct_images=args.distinct_images)
+    openai_server = start_mock_openai(latency=args.openai_latency)
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    with tempfile.TemporaryDirectory(prefix="bench_catalog_") as catalog_dir:
+        catalog_path = os.path.join(catalog_dir, "catalog.csv")
+        write_stub_catalog(args.source_catalog, catalog_path, f"http://127.0.0.1:{shop.server_port}")
+        env = dict(
+            os.environ,
+            CATALOG_PATH=catalog_path,
+            OPENAI_API_KEY="bench",
+            OPENAI_API_BASE=f"http://127.0.0.1:{openai_server.server_port}/v1",
+            TRACE_FILE=""
+        )
+        if args.pdf_memory_mb is not None:
+            env["PDF_MEMORY_MB"] = str(args.pdf_memory_mb)
+
+        results = {}
+        results["catalog"] = run_scenario("catalog", ["--lookups", str(args.lookups)], env)
+        for size in sizes:
+            print(f"Generowanie {size} etykiet...", file=sys.stderr)
+            results[f"generate_{size}"] = run_scenario("generate", ["--labels", str(size)], env)
+        results["render"] = run_scenario(
+            "render", ["--labels", str(args.render_labels), "--repeat", str(args.repeat)], env
+        )
+
+    shop.shutdown()
+    openai_server.shutdown()
+
+    commit, dirty = git_revision()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "sizes": sizes,
+            "shop_latency": args.shop_latency,
+            "openai_latency": args.openai_latency,
+            "pages": bool(args.pages),
+            "distinct_images": args.distinct_images,
+            "pdf_memory_mb": args.pdf_memory_mb,
+            "render_labels": args.render_labels,
+            "lookups": args.lookups
+        },
+        "results": results
+    }
+    print(json.dumps(report, indent=4))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from io import BytesIO
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Benchmark renderowania etykiet: czas na stronę i rozmiar pliku PDF.
+# Użycie: python benchmarks/bench_render.py --labels 40 --repeat 5
+
+
+# Funkcja tworząca przykładowe zdjęcie produktu (rozmiar zbliżony do "large_default" ze sklepu);
+# różne wartości variant dają różne zdjęcia (inny kolor i położenie linii)
+def sample_image_bytes(size=(800, 800), variant=0):
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", size, (240, 240, 240))
+    draw = ImageDraw.Draw(img)
+    color = (200, (30 + variant * 47) % 256, (40 + variant * 89) % 256)
+    for i in range(variant % 40, size[0], 40):
+        draw.line([(i, 0), (size[0] - i, size[1])], fill=color, width=6)
+    out = BytesIO()
+    img.save(out, format="JPEG", quality=92)
+    return out.getvalue()
+
+
+# Serwer HTTP w wątku tła podający przykładowe zdjęcie pod dowolnym adresem
+def start_image_server(image_bytes):
+    class Handler(SimpleHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(image_bytes)))
+            self.send_header("ETag", '"bench"')
+            self.end_headers()
+            self.wfile.write(image_bytes)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Funkcja przygotowująca dane etykiet na podstawie zapisanych danych produktów
+def sample_products(count, image_base_url):
+    with open(os.path.join(ROOT_DIR, "temp_product_data.json"), "r", encoding="utf-8") as f:
+        products = json.load(f)
+    result = []
+    for i in range(count):
+        product = dict(products[i % len(products)])
+        product["image_url"] = f"{image_base_url}/img/{i}.jpg"
+        product["product_url"] = f"{product['product_url']}?v={i}"
+        result.append(product)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark renderowania etykiet PDF.")
+    parser.add_argument("--labels", type=int, default=40, help="liczba etykiet w dokumencie")
+    parser.add_argument("--repeat", type=int, default=5, help="liczba powtórzeń pomiaru")
+    args = parser.parse_args()
+
+    os.environ.setdefault("IMAGE_CACHE_DIR", tempfile.mkdtemp(prefix="bench_images_"))
+    os.chdir(ROOT_DIR)
+    server = start_image_server(sample_image_bytes())
+    products = sample_products(args.labels, f"http://127.0.0.1:{server.server_port}")
+
+    from pdf import create_pdf_with_grid, new_label_pdf, add_label_page, LABELS_PER_PAGE
+    output_file = os.path.join(tempfile.mkdtemp(prefix="bench_pdf_"), "bench.pdf")
+
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        # Rozgrzewka: pobranie zdjęć do pamięci podręcznej i wczytanie fontów
+        create_pdf_with_grid(products, output_file=output_file)
+
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            create_pdf_with_grid(products, output_file=output_file)
+            timings.append(time.perf_counter() - start)
+
+    # Liczba operacji w (nieskompresowanym) strumieniu treści jednej strony
+    pdf = new_label_pdf()
+    add_label_page(pdf, products[:LABELS_PER_PAGE])
+    content_ops = bytes(pdf.pages[1].contents).count(b"\n")
+
+    pages = -(-args.labels // LABELS_PER_PAGE)
+    best = min(timings)
+    print(json.dumps({
+        "labels": args.labels,
+        "pages": pages,
+        "best_seconds": round(best, 4),
+        "mean_seconds": round(sum(timings) / len(timings), 4),
+        "ms_per_page": round(best / pages * 1000, 2),
+        "pdf_bytes": os.path.getsize(output_file),
+        "content_ops_per_page": content_ops
+    }, indent=4))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
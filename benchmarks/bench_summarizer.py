@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from mock_openai import fake_summary, start_mock_openai
+
+# Benchmark usługi podsumowań (summarizer.SummaryService) z lokalnym API OpenAI (mock_openai.py):
+# zapytania pojedyncze w porównaniu z wsadowymi, z powtórzonymi opisami, limitami zapytań (429)
+# i wadliwymi odpowiedziami wsadowymi. Każde podsumowanie porównywane jest z oczekiwanym - przy
+# niezgodności benchmark kończy się kodem 1.
+# Użycie: python benchmarks/bench_summarizer.py --descriptions 200 --latency 0.2
+#         python benchmarks/bench_summarizer.py --rate-limit-every 7 --faulty-batches
+
+
+# Funkcja tworząca opisy produktów; co repeat_every-ty opis powtarza wcześniejszy (łączenie w locie)
+def sample_descriptions(count, repeat_every):
+    descriptions = []
+    for n in range(count):
+        if repeat_every and n and n % repeat_every == 0:
+            descriptions.append(descriptions[n // 2])
+        else:
+            descriptions.append(f"Opis produktu {n}. " + "Gaśnica proszkowa ABC z manometrem i wężem. " * 12)
+    return descriptions
+
+
+# Scenariusz: podsumowanie wszystkich opisów jednocześnie przez nową usługę w nowej pętli zdarzeń
+def run_scenario(descriptions, batch_size, concurrency):
+    from summarizer import SummaryService
+
+    async def summarize_all():
+        service = SummaryService(concurrency=concurrency, batch_size=batch_size)
+        results = await asyncio.gather(*(service.summarize(description) for description in descriptions))
+        return results, service.stats
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        results, stats = asyncio.run(summarize_all())
+    elapsed = time.perf_counter() - start
+
+    wrong = sum(1 for description, summary in zip(descriptions, results) if summary != fake_summary(description))
+    return dict(stats, seconds=round(elapsed, 3), wrong=wrong)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark usługi podsumowań z lokalnym API OpenAI.")
+    parser.add_argument("--descriptions", type=int, default=200, help="liczba opisów")
+    parser.add_argument("--repeat-every", type=int, default=10, help="co który opis jest powtórzeniem (0 - bez)")
+    parser.add_argument("--latency", type=float, default=0.2, help="opóźnienie odpowiedzi OpenAI (s)")
+    parser.add_argument("--concurrency", type=int, default=4, help="liczba równoległych zapytań")
+    parser.add_argument("--batch-size", type=int, default=8, help="liczba opisów w zapytaniu wsadowym")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="co które zapytanie serwer zwraca błąd 429")
+    parser.add_argument("--faulty-batches", action="store_true",
+                        help="odpowiedzi wsadowe z brakującym i zdublowanym opisem")
+    args = parser.parse_args()
+
+    server = start_mock_openai(latency=args.latency, rate_limit_every=args.rate_limit_every,
+                               faulty_batches=args.faulty_batches)
+    # Adres API ustawiany przed pierwszym importem openai (summarizer importuje go przy pierwszym zapytaniu)
+    os.environ["OPENAI_API_BASE"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+    descriptions = sample_descriptions(args.descriptions, args.repeat_every)
+    results = {
+        "single": run_scenario(descriptions, 1, args.concurrency),
+        "batched": run_scenario(descriptions, args.batch_size, args.concurrency)
+    }
+    server.shutdown()
+
+    print(json.dumps({
+        "config": {
+            "descriptions": args.descriptions,
+            "repeat_every": args.repeat_every,
+            "latency": args.latency,
+            "concurrency": args.concurrency,
+            "batch_size": args.batch_size,
+            "rate_limit_every": args.rate_limit_every,
+            "faulty_batches": args.faulty_batches
+        },
+        "results": results
+    }, indent=4))
+    sys.exit(1 if any(result["wrong"] for result in results.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import contextlib
+import os
+import subprocess
+import sys
+import types
+from io import BytesIO
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from bench_render import sample_image_bytes, sample_products, start_image_server
+
+# Porównanie wyglądu etykiet z rendererem bazowym (np. sprzed szablonu stron): każda strona dokumentu
+# dla podanych liczb etykiet (także niepełne strony) rasteryzowana jest przez PyMuPDF i porównywana piksel
+# po pikselu (z tolerancją na wygładzanie krawędzi). Wymaga pakietu pymupdf (pip install pymupdf),
+# który nie jest zależnością aplikacji.
+# Renderer bazowy to pdf.py z podanej wersji repozytorium (commit, tag, gałąź) albo zapisany plik pdf.py.
+# Użycie: python benchmarks/check_render.py --baseline <wersja lub plik pdf.py> --labels 1,2,3,4,5,7
+
+
+# Funkcja wczytująca pdf.py z pliku lub z podanej wersji repozytorium jako osobny moduł
+def load_baseline_renderer(baseline):
+    if os.path.isfile(baseline):
+        with open(baseline, "r", encoding="utf-8") as f:
+            source = f.read()
+    else:
+        source = subprocess.run(["git", "show", f"{baseline}:pdf.py"], cwd=ROOT_DIR,
+                                capture_output=True, text=True, encoding="utf-8", check=True).stdout
+    module = types.ModuleType("pdf_baseline")
+    module.__file__ = os.path.join(ROOT_DIR, "pdf_baseline.py")
+    exec(compile(source, module.__file__, "exec"), module.__dict__)
+    return module
+
+
+# Funkcja zwracająca bajty dokumentu z renderera wersji bazowej (zapisuje przez pdf.output)
+def render_baseline(baseline, products):
+    out = BytesIO()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        baseline.create_pdf_with_grid(products, out)
+    return out.getvalue()
+
+
+# Funkcja zwracająca numery stron (od 1), na których któryś piksel różni się o więcej niż tolerance
+def compare_documents(pymupdf, expected, actual, dpi, tolerance):
+    expected_doc = pymupdf.open(stream=expected, filetype="pdf")
+    actual_doc = pymupdf.open(stream=actual, filetype="pdf")
+    if expected_doc.page_count != actual_doc.page_count:
+        return [f"liczba stron {expected_doc.page_count} != {actual_doc.page_count}"]
+    differences = []
+    for number in range(expected_doc.page_count):
+        expected_pixels = expected_doc[number].get_pixmap(dpi=dpi).samples
+        actual_pixels = actual_doc[number].get_pixmap(dpi=dpi).samples
+        if expected_pixels != actual_pixels and max(
+            abs(a - b) for a, b in zip(expected_pixels, actual_pixels)
+        ) > tolerance:
+            differences.append(number + 1)
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Porównanie wyglądu etykiet z rendererem bazowym.")
+    parser.add_argument("--labels", default="1,2,3,4,5,7", help="liczby etykiet w porównywanych dokumentach")
+    parser.add_argument("--baseline", required=True,
+                        help="wersja repozytorium (commit, tag) lub plik pdf.py z rendererem bazowym")
+    parser.add_argument("--dpi", type=int, default=100, help="rozdzielczość rasteryzacji")
+    parser.add_argument("--tolerance", type=int, default=8, help="dopuszczalna różnica wartości składowej piksela")
+    args = parser.parse_args()
+
+    try:
+        import pymupdf
+    except ImportError:
+        parser.error("Porównanie wymaga pakietu pymupdf (pip install pymupdf).")
+
+    # Renderer bazowy wczytuje fonty ścieżką względną
+    baseline_path = os.path.abspath(args.baseline) if os.path.isfile(args.baseline) else args.baseline
+    os.chdir(ROOT_DIR)
+    try:
+        baseline = load_baseline_renderer(baseline_path)
+    except subprocess.CalledProcessError as e:
+        parser.error(f"Nie znaleziono pdf.py w wersji {args.baseline}: {e.stderr.strip()}")
+    from pdf import create_pdf_with_grid
+
+    server = start_image_server(sample_image_bytes())
+    failed = False
+    for count in [int(value) for value in args.labels.split(",") if value.strip()]:
+        products = sample_products(count, f"http://127.0.0.1:{server.server_port}")
+        differences = compare_documents(
+            pymupdf, render_baseline(baseline, products), create_pdf_with_grid(products, None), args.dpi,
+            args.tolerance
+        )
+        failed = failed or bool(differences)
+        print(f"{count} etykiet: " + (f"różne strony {differences}" if differences else "zgodne"))
+    server.shutdown()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
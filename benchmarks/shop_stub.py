@@ -0,0 +1,121 @@
+import argparse
+import hashlib
+import os
+import sys
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from bench_extract import synthetic_page
+from bench_render import sample_image_bytes
+from catalog import decode_catalog
+
+# Lokalny serwer imitujący sklep: strony produktów (zapisane lub przykładowe) i zdjęcia.
+# Użycie: python benchmarks/shop_stub.py --port 8002 --pages zapisane_strony --catalog stub.csv
+#         CATALOG_PATH=stub.csv streamlit run app.py
+# Zapisane strony wyszukiwane są po nazwie pliku z adresu produktu (np. 2761--pokrywa-nasady.html).
+
+
+class ShopStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    pages_dir = None
+    latency = 0.0
+    image = b""
+    distinct_images = False
+
+    def log_message(self, format, *args):
+        pass
+
+    def _page(self, path):
+        if self.pages_dir:
+            file_path = os.path.join(self.pages_dir, os.path.basename(path))
+            if os.path.isfile(file_path):
+                with open(file_path, "rb") as f:
+                    return f.read()
+        return synthetic_page(zlib.crc32(path.encode("utf-8")) % 100000)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        path = urlsplit(self.path).path
+        if path.lower().endswith((".jpg", ".jpeg", ".png")):
+            if self.distinct_images:
+                body = sample_image_bytes(variant=zlib.crc32(path.encode("utf-8")))
+            else:
+                body = self.image
+            content_type = "image/jpeg"
+        else:
+            body, content_type = self._page(path), "text/html; charset=utf-8"
+
+        etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# Funkcja uruchamiająca serwer w wątku tła; zwraca obiekt serwera (server.shutdown() kończy pracę).
+# distinct_images - każdy adres zdjęcia dostaje inne zdjęcie, jak w sklepie (fpdf2 osadza identyczne zdjęcia raz)
+def start_shop_stub(port=0, pages_dir=None, latency=0.0, distinct_images=False):
+    handler = type("Handler", (ShopStubHandler,), {
+        "pages_dir": pages_dir, "latency": latency, "image": sample_image_bytes(),
+        "distinct_images": distinct_images
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Funkcja zapisująca kopię katalogu, w której adresy sklepu wskazują na serwer lokalny
+def write_stub_catalog(source_path, target_path, base_url):
+    with open(source_path, "rb") as f:
+        text, encoding = decode_catalog(f.read())
+
+    lines = text.splitlines()
+    rewritten = [lines[0]]
+    for line in lines[1:]:
+        fields = line.split(";")
+        for i in (1, 2):
+            if i < len(fields) and fields[i]:
+                parts = urlsplit(fields[i])
+                fields[i] = f"{base_url}{parts.path}"
+        rewritten.append(";".join(fields))
+
+    with open(target_path, "w", encoding=encoding, newline="") as f:
+        f.write("\n".join(rewritten) + "\n")
+    return len(rewritten) - 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokalny serwer imitujący sklep (strony produktów i zdjęcia).")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--pages", help="katalog z zapisanymi stronami produktów")
+    parser.add_argument("--latency", type=float, default=0.05, help="opóźnienie odpowiedzi w sekundach")
+    parser.add_argument("--distinct-images", action="store_true", help="inne zdjęcie dla każdego produktu")
+    parser.add_argument("--catalog", help="zapisz katalog wskazujący na serwer lokalny do tego pliku")
+    parser.add_argument("--source-catalog", default=os.path.join(ROOT_DIR, "url_list.csv"), help="katalog źródłowy")
+    args = parser.parse_args()
+
+    server = start_shop_stub(args.port, args.pages, args.latency, args.distinct_images)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    if args.catalog:
+        count = write_stub_catalog(args.source_catalog, args.catalog, base_url)
+        print(f"Zapisano katalog {args.catalog} ({count} produktów).")
+    print(f"Serwer sklepu: {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# Ścieżka do pliku bazy podręcznej (można ją nadpisać zmienną środowiskową CACHE_PATH)
+CACHE_PATH = os.getenv(
+    "CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache.sqlite3')
+)
+
+# Czas ważności (w sekundach) danych produktu ze strony - cena zmienia się najczęściej
+PRODUCT_TTL = float(os.getenv("PRODUCT_TTL", str(6 * 3600)))
+# Czas ważności (w sekundach) podsumowań opisów z OpenAI
+SUMMARY_TTL = float(os.getenv("SUMMARY_TTL", str(30 * 24 * 3600)))
+# Czas ważności (w sekundach) gotowych danych etykiet przygotowanych przez prewarm.py - etykieta zawiera cenę,
+# więc nie może być ważna dłużej niż dane produktu (PRODUCT_TTL); dłużej utrzymuje ją price_refresh.py
+LABEL_TTL = min(float(os.getenv("LABEL_TTL", str(PRODUCT_TTL))), PRODUCT_TTL)
+# Maksymalna liczba indeksów w jednym zapytaniu SQL
+SQL_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    url TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    url TEXT NOT NULL,
+    description_hash TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (url, description_hash)
+);
+CREATE TABLE IF NOT EXISTS labels (
+    reference TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+# Funkcja licząca skrót treści opisu produktu
+def description_hash(description):
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+
+# Trwała pamięć podręczna danych produktów i podsumowań opisów (SQLite).
+# Odczyt pojedynczego wpisu po kluczu trwa kilkadziesiąt mikrosekund, a w trybie WAL nie czeka na zapisy
+# innych procesów, więc korutyny wywołują get_product, get_validators i get_summary bezpośrednio.
+# Zapisy (mogą czekać na blokadę bazy zajętą przez prewarm.py lub price_refresh.py) oraz get_labels
+# dla wielu indeksów (kilka ms na kilkaset etykiet) korutyny wykonują w wątku (asyncio.to_thread).
+class ProductCache:
+    def __init__(self, path=CACHE_PATH, product_ttl=PRODUCT_TTL, summary_ttl=SUMMARY_TTL, label_ttl=LABEL_TTL):
+        self.path = path
+        self.product_ttl = product_ttl
+        self.summary_ttl = summary_ttl
+        self.label_ttl = label_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # W trybie WAL wystarcza synchronizacja przy punktach kontrolnych - zapis wielu etykiet bez fsync na wpis
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._stats = {"product_hits": 0, "product_misses": 0, "product_revalidated": 0,
+                       "summary_hits": 0, "summary_misses": 0, "label_hits": 0, "label_misses": 0}
+
+    # Dodanie kolumn walidatorów HTTP do bazy utworzonej przez starszą wersję
+    def _migrate(self):
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(products)")}
+        for column in ("etag", "last_modified"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE products ADD COLUMN {column} TEXT")
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    # Zwraca krotkę (name, price, description, producer, index) lub None, gdy brak wpisu nie starszego niż max_age
+    # (domyślnie PRODUCT_TTL; float("inf") - ostatnia zapisana wersja, np. gdy sklep nie odpowiada)
+    def get_product(self, url, max_age=None):
+        max_age = self.product_ttl if max_age is None else max_age
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, fetched_at FROM products WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > max_age:
+            self._count("product_misses")
+            return None
+        self._count("product_hits")
+        return tuple(json.loads(row[0]))
+
+    # Zwraca (dane, etag, last_modified) wpisu, także przeterminowanego, jeśli sklep podał walidatory;
+    # służy do zapytania warunkowego (If-None-Match / If-Modified-Since)
+    def get_validators(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, etag, last_modified FROM products WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or not (row[1] or row[2]):
+            return None
+        return tuple(json.loads(row[0])), row[1], row[2]
+
+    def put_product(self, url, info, etag=None, last_modified=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO products (url, data, fetched_at, etag, last_modified) VALUES (?, ?, ?, ?, ?)",
+                (url, json.dumps(list(info), ensure_ascii=False), time.time(), etag, last_modified)
+            )
+
+    # Odnowienie ważności wpisu po odpowiedzi 304 Not Modified
+    def touch_product(self, url):
+        with self._lock:
+            self._conn.execute("UPDATE products SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._stats["product_revalidated"] += 1
+
+    # Podsumowanie jest kluczowane adresem produktu i skrótem treści opisu
+    def get_summary(self, url, description):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, created_at FROM summaries WHERE url = ? AND description_hash = ?",
+                (url, description_hash(description))
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.summary_ttl:
+            self._count("summary_misses")
+            return None
+        self._count("summary_hits")
+        return row[0]
+
+    def put_summary(self, url, description, summary):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (url, description_hash, summary, created_at) VALUES (?, ?, ?, ?)",
+                (url, description_hash(description), summary, time.time())
+            )
+
+    # Gotowe dane etykiet dla wielu indeksów naraz; entries to słownik indeks -> (Url, Pic_url) z katalogu.
+    # Zwraca tylko świeże wpisy (nie starsze niż max_age, domyślnie LABEL_TTL), których adres produktu
+    # i zdjęcia zgadza się z bieżącym katalogiem.
+    def get_labels(self, entries, max_age=None):
+        max_age = self.label_ttl if max_age is None else max_age
+        references = list(entries)
+        rows = []
+        with self._lock:
+            for start in range(0, len(references), SQL_BATCH):
+                chunk = references[start:start + SQL_BATCH]
+                rows.extend(self._conn.execute(
+                    f"SELECT reference, url, data, updated_at FROM labels WHERE reference IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall())
+
+        labels = {}
+        now = time.time()
+        for reference, url, data, updated_at in rows:
+            if url != entries[reference][0] or now - updated_at > max_age:
+                continue
+            label = json.loads(data)
+            if label.get("image_url") == entries[reference][1]:
+                labels[reference] = label
+        with self._lock:
+            self._stats["label_hits"] += len(labels)
+            self._stats["label_misses"] += len(references) - len(labels)
+        return labels
+
+    def put_label(self, reference, url, label):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO labels (reference, url, data, updated_at) VALUES (?, ?, ?, ?)",
+                (reference, url, json.dumps(label, ensure_ascii=False), time.time())
+            )
+
+    # Odnowienie ważności etykiet, których dane zostały potwierdzone (np. przy odświeżaniu cen)
+    def touch_labels(self, references):
+        references = list(references)
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(references), SQL_BATCH):
+                chunk = references[start:start + SQL_BATCH]
+                self._conn.execute(
+                    f"UPDATE labels SET updated_at = ? WHERE reference IN ({','.join('?' * len(chunk))})",
+                    [now, *chunk]
+                )
+
+    # Usunięcie wszystkich wpisów dla podanego adresu produktu
+    def invalidate(self, url):
+        with self._lock:
+            self._conn.execute("DELETE FROM products WHERE url = ?", (url,))
+            self._conn.execute("DELETE FROM summaries WHERE url = ?", (url,))
+            self._conn.execute("DELETE FROM labels WHERE url = ?", (url,))
+
+    # Usunięcie wpisów wielu adresów produktów oraz gotowych etykiet podanych indeksów w jednej transakcji
+    def invalidate_many(self, urls=(), references=()):
+        urls, references = list(urls), list(references)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for start in range(0, len(urls), SQL_BATCH):
+                    chunk = urls[start:start + SQL_BATCH]
+                    for table in ("products", "summaries", "labels"):
+                        self._conn.execute(
+                            f"DELETE FROM {table} WHERE url IN ({','.join('?' * len(chunk))})", chunk
+                        )
+                for start in range(0, len(references), SQL_BATCH):
+                    chunk = references[start:start + SQL_BATCH]
+                    self._conn.execute(
+                        f"DELETE FROM labels WHERE reference IN ({','.join('?' * len(chunk))})", chunk
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM products")
+            self._conn.execute("DELETE FROM summaries")
+            self._conn.execute("DELETE FROM labels")
+
+    # Statystyki trafień/chybień w bieżącym procesie oraz liczba wpisów w bazie
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["products_stored"] = self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+            stats["summaries_stored"] = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+            stats["labels_stored"] = self._conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+        for kind in ("product", "summary", "label"):
+            lookups = stats[f"{kind}_hits"] + stats[f"{kind}_misses"]
+            stats[f"{kind}_hit_ratio"] = stats[f"{kind}_hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+# Funkcja zwracająca współdzieloną pamięć podręczną (jedna na proces)
+def get_cache():
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ProductCache()
+    return _default_cache
+
+
+# Uruchomienie: python cache.py [stats|clear]
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "clear":
+        get_cache().clear()
+        print("Pamięć podręczna została wyczyszczona.")
+    else:
+        print(json.dumps(get_cache().stats(), indent=4))
@@ -0,0 +1,180 @@
+import csv
+import io
+import os
+import re
+import threading
+
+# Ścieżka do pliku katalogu produktów (można ją nadpisać zmienną środowiskową CATALOG_PATH)
+CATALOG_PATH = os.getenv(
+    "CATALOG_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'url_list2.csv')
+)
+
+# Kodowania sprawdzane po kolei przy wczytywaniu katalogu
+ENCODINGS = ['cp1250', 'utf-8', 'latin1', 'iso-8859-2']
+
+
+# Funkcja wykrywająca kodowanie i dekodująca zawartość pliku katalogu
+def decode_catalog(raw):
+    for encoding in ENCODINGS:
+        try:
+            return raw.decode(encoding), encoding
+        except UnicodeDecodeError:
+            continue
+    return None, None
+
+
+# Funkcja parsująca zawartość katalogu do słownika reference -> (Url, Pic_url)
+def parse_catalog(text):
+    entries = {}
+    reader = csv.DictReader(io.StringIO(text, newline=''), delimiter=';')
+    for row in reader:
+        # Przy zduplikowanych indeksach obowiązuje pierwszy wiersz (jak przy liniowym skanowaniu)
+        entries.setdefault(row['reference'], (row['Url'], row['Pic_url']))
+    return entries
+
+
+# Funkcja wczytująca plik katalogu; zwraca (słownik reference -> (Url, Pic_url), kodowanie)
+def load_catalog_file(file_path):
+    try:
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+    except OSError as e:
+        print(f"Błąd podczas odczytu pliku katalogu {file_path}: {e}")
+        return {}, None
+
+    text, encoding = decode_catalog(raw)
+    if text is None:
+        print(f"Nie udało się zdekodować pliku katalogu {file_path}.")
+        return {}, None
+
+    try:
+        return parse_catalog(text), encoding
+    except Exception as e:
+        print(f"Błąd podczas odczytu pliku z kodowaniem {encoding}: {e}")
+        return {}, encoding
+
+
+# Porównanie dwóch wersji katalogu (słowniki reference -> (Url, Pic_url)):
+# indeksy dodane, usunięte oraz takie, dla których zmienił się adres produktu lub zdjęcia
+def diff_catalogs(old, new):
+    return {
+        "added": [reference for reference in new if reference not in old],
+        "removed": [reference for reference in old if reference not in new],
+        "changed": [reference for reference in new if reference in old and old[reference] != new[reference]]
+    }
+
+
+# Funkcja odczytująca listę indeksów z wklejonego tekstu (oddzielonych spacjami, przecinkami lub w wierszach)
+def parse_indices(text):
+    indices = []
+    for line in text.splitlines():
+        line = line.strip().lstrip('\ufeff')
+        if not line:
+            continue
+        # Wiersz w formacie katalogu (reference;Url;Pic_url) - bierzemy tylko pierwszą kolumnę
+        if ';' in line:
+            tokens = [line.split(';')[0]]
+        else:
+            tokens = re.split(r'[\s,]+', line)
+        for token in tokens:
+            token = token.strip().strip('"')
+            if token and token.lower() != 'reference':
+                indices.append(token)
+    return indices
+
+
+# Funkcja odczytująca listę indeksów z pliku CSV (katalog, eksport arkusza, np. reference,qty) - indeksem jest
+# pierwsza kolumna wiersza przy każdym separatorze (; , tabulator). Plik bez separatora (jeden indeks
+# w wierszu) odczytywany jest jak wklejony tekst.
+def parse_index_file(text):
+    text = text.lstrip('\ufeff')
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=";,\t")
+    except csv.Error:
+        return parse_indices(text)
+
+    indices = []
+    for row in csv.reader(io.StringIO(text, newline=''), dialect):
+        token = row[0].strip().strip('"') if row else ""
+        if token and token.lower() != 'reference':
+            indices.append(token)
+    return indices
+
+
+# Funkcja wczytująca listę indeksów z pliku (CSV katalogu lub jeden indeks w wierszu)
+def read_index_file(file_path):
+    with open(file_path, 'rb') as f:
+        text, _ = decode_catalog(f.read())
+    return parse_index_file(text or "")
+
+
+# Indeks katalogu trzymany w pamięci, przeładowywany po zmianie pliku na dysku
+class CatalogIndex:
+    def __init__(self, file_path=CATALOG_PATH):
+        self.file_path = file_path
+        self.encoding = None
+        self._entries = {}
+        self._signature = None
+        self._lock = threading.Lock()
+
+    # Sprawdzenie sygnatury pliku (mtime + rozmiar) i ewentualne ponowne wczytanie
+    def _refresh(self):
+        try:
+            stat = os.stat(self.file_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError as e:
+            # Komunikat wypisujemy tylko raz, a nie przy każdym wyszukiwaniu
+            if self._signature != 'missing':
+                print(f"Błąd podczas odczytu pliku katalogu {self.file_path}: {e}")
+            self._entries, self._signature = {}, 'missing'
+            return
+
+        if signature == self._signature:
+            return
+
+        with self._lock:
+            if signature == self._signature:
+                return
+            self._entries, self.encoding = self._load()
+            self._signature = signature
+
+    def _load(self):
+        return load_catalog_file(self.file_path)
+
+    # Zwraca (Url, Pic_url) dla indeksu lub (None, None), gdy indeksu nie ma w katalogu
+    def get(self, reference):
+        self._refresh()
+        return self._entries.get(reference, (None, None))
+
+    # Wyszukiwanie wielu indeksów naraz - jedno sprawdzenie pliku dla całej listy
+    def get_many(self, references):
+        self._refresh()
+        entries = self._entries
+        return {reference: entries.get(reference, (None, None)) for reference in references}
+
+    def references(self):
+        self._refresh()
+        return list(self._entries)
+
+    def __contains__(self, reference):
+        self._refresh()
+        return reference in self._entries
+
+    def __len__(self):
+        self._refresh()
+        return len(self._entries)
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+# Funkcja zwracająca współdzielony indeks katalogu (jeden na proces)
+def get_catalog():
+    global _default_index
+    if _default_index is None:
+        with _default_index_lock:
+            if _default_index is None:
+                _default_index = CatalogIndex()
+    return _default_index
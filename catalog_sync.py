@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+
+from assets import PRODUCT_IMAGE_WIDTH, invalidate_image
+from cache import get_cache
+from catalog import CATALOG_PATH, diff_catalogs, load_catalog_file
+
+# Liczba indeksów każdego rodzaju zmian wypisywanych w raporcie (pełne listy w pliku --report)
+REPORT_SAMPLE = 20
+
+
+# Synchronizacja katalogu z nowym eksportem: porównanie z bieżącym katalogiem, unieważnienie danych
+# tylko zmienionych i usuniętych wierszy, a następnie podmiana pliku katalogu (poprzednia wersja w .bak).
+# Dane produktów i podsumowania usuwane są dla adresów, które zniknęły z katalogu, zdjęcia - dla adresów
+# zdjęć, które zniknęły, a gotowe etykiety - dla wszystkich zmienionych i usuniętych indeksów.
+def sync_catalog(export_path, catalog_path=CATALOG_PATH, dry_run=False):
+    new, encoding = load_catalog_file(export_path)
+    if not new:
+        raise ValueError(f"Plik {export_path} nie zawiera żadnych produktów - katalog nie został zmieniony.")
+    old = load_catalog_file(catalog_path)[0] if os.path.exists(catalog_path) else {}
+
+    diff = diff_catalogs(old, new)
+    stale = diff["removed"] + diff["changed"]
+    new_urls = {url for url, _ in new.values()}
+    new_pics = {pic_url for _, pic_url in new.values()}
+    stale_urls = sorted({old[reference][0] for reference in stale} - new_urls - {""})
+    stale_pics = sorted({old[reference][1] for reference in stale} - new_pics - {""})
+
+    report = {
+        "catalog": catalog_path,
+        "export": export_path,
+        "encoding": encoding,
+        "products_before": len(old),
+        "products_after": len(new),
+        "added": len(diff["added"]),
+        "removed": len(diff["removed"]),
+        "changed": len(diff["changed"]),
+        "unchanged": len(new) - len(diff["added"]) - len(diff["changed"]),
+        "invalidated_products": len(stale_urls),
+        "invalidated_labels": len(stale),
+        "invalidated_images": 0,
+        "dry_run": dry_run,
+        "references": diff
+    }
+    if dry_run:
+        return report
+
+    get_cache().invalidate_many(urls=stale_urls, references=stale)
+    report["invalidated_images"] = sum(invalidate_image(pic_url, PRODUCT_IMAGE_WIDTH) for pic_url in stale_pics)
+
+    # Podmiana katalogu: zapis do pliku tymczasowego w tym samym katalogu i atomowa zamiana
+    # (działające procesy wczytają nową wersję po zmianie daty modyfikacji pliku)
+    if os.path.exists(catalog_path):
+        shutil.copy2(catalog_path, f"{catalog_path}.bak")
+    tmp_path = f"{catalog_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.copyfile(export_path, tmp_path)
+    os.replace(tmp_path, catalog_path)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synchronizacja katalogu produktów z nowym eksportem CSV.")
+    parser.add_argument("export", help="nowy eksport katalogu (reference;Url;Pic_url)")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help="plik katalogu używany przez aplikację")
+    parser.add_argument("--dry-run", action="store_true", help="tylko pokaż różnice, bez zmian w katalogu i pamięci podręcznej")
+    parser.add_argument("--report", help="zapisz pełny raport (z listami indeksów) do pliku JSON")
+    args = parser.parse_args()
+
+    try:
+        report = sync_catalog(args.export, args.catalog, args.dry_run)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+
+    summary = {key: value for key, value in report.items() if key != "references"}
+    summary["sample"] = {kind: references[:REPORT_SAMPLE] for kind, references in report["references"].items()}
+    print(json.dumps(summary, ensure_ascii=False, indent=4))
+
+
+if __name__ == "__main__":
+    main()
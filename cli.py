@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from catalog import read_index_file
+from pdf import create_pdf_with_grid, LABELS_PER_PAGE
+from tracing import get_tracer
+
+MANIFEST_NAME = "manifest.json"
+# Procesy renderujące uruchamiane są metodą spawn: proces główny ma już wtedy wątki (pobieranie zdjęć,
+# pętla zdarzeń), połączenie SQLite i pulę połączeń HTTP, a proces utworzony przez fork mógłby przejąć
+# zajętą przez inny wątek blokadę (np. pamięci zdjęć lub puli urllib3) i zawiesić się
+RENDER_CONTEXT = multiprocessing.get_context("spawn")
+
+
+# Funkcja renderująca jeden plik PDF w procesie roboczym; zwraca czas renderowania
+def render_chunk(products, output_file):
+    start = time.perf_counter()
+    tmp_file = f"{output_file}.tmp"
+    create_pdf_with_grid(products, output_file=tmp_file)
+    os.replace(tmp_file, output_file)
+    return time.perf_counter() - start
+
+
+# Funkcja wczytująca stan poprzedniego uruchomienia (do wznawiania po awarii)
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"chunks": {}}
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4)
+    os.replace(f"{path}.tmp", path)
+
+
+# Funkcja dzieląca indeksy na pliki wynikowe po pages_per_file stron
+def split_into_chunks(indices, pages_per_file):
+    size = pages_per_file * LABELS_PER_PAGE
+    return [
+        (f"labels_{number:04d}.pdf", indices[start:start + size])
+        for number, start in enumerate(range(0, len(indices), size), start=1)
+    ]
+
+
+# Funkcja sprawdzająca, czy plik został już wygenerowany w poprzednim uruchomieniu
+def is_chunk_done(output_dir, manifest, file_name, indices):
+    entry = manifest["chunks"].get(file_name)
+    return (
+        entry is not None
+        and entry.get("status") == "done"
+        and entry.get("indices") == indices
+        and os.path.exists(os.path.join(output_dir, file_name))
+    )
+
+
+# Główna pętla: pobieranie danych (współbieżnie, I/O) i renderowanie PDF w puli procesów
+async def run_batch(indices, output_dir, pages_per_file, workers):
+    # Import odroczony - procesy renderujące nie potrzebują scrapera ani klienta OpenAI
+    from scrype import process_products, get_urls_from_csv, create_http_client
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    chunks = split_into_chunks(indices, pages_per_file)
+    pending = [(name, chunk) for name, chunk in chunks if not is_chunk_done(output_dir, manifest, name, chunk)]
+    skipped = len(chunks) - len(pending)
+    if skipped:
+        print(f"Wznowienie: pominięto {skipped} gotowych plików.")
+
+    timings = {"catalog": 0.0, "fetch": 0.0, "render": 0.0}
+    labels = 0
+    loop = asyncio.get_running_loop()
+    renders = set()
+
+    start = time.perf_counter()
+    stage_start = time.perf_counter()
+    catalog_entries = get_urls_from_csv(indices)
+    timings["catalog"] = time.perf_counter() - stage_start
+
+    # Zakończenie renderowania pliku - zapis stanu, aby po awarii nie powtarzać pracy
+    def finish_render(file_name, chunk, products, failures, future):
+        nonlocal labels
+        try:
+            timings["render"] += future.result()
+            labels += len(products)
+            manifest["chunks"][file_name] = {
+                "status": "done",
+                "indices": chunk,
+                "labels": len(products),
+                "failures": failures
+            }
+            print(f"Zapisano {file_name} ({len(products)} etykiet).")
+        except Exception as e:
+            manifest["chunks"][file_name] = {"status": "failed", "indices": chunk, "error": str(e)}
+            print(f"Błąd podczas renderowania {file_name}: {e}")
+        save_manifest(output_dir, manifest)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=RENDER_CONTEXT) as executor:
+        async with create_http_client() as client:
+            for file_name, chunk in pending:
+                stage_start = time.perf_counter()
+                failures = {}
+                products = await process_products(client, chunk, catalog_entries, failures)
+                timings["fetch"] += time.perf_counter() - stage_start
+
+                if not products:
+                    manifest["chunks"][file_name] = {"status": "failed", "indices": chunk, "failures": failures}
+                    save_manifest(output_dir, manifest)
+                    continue
+
+                future = loop.run_in_executor(
+                    executor, render_chunk, products, os.path.join(output_dir, file_name)
+                )
+                future.add_done_callback(
+                    lambda f, n=file_name, c=chunk, p=products, e=failures: finish_render(n, c, p, e, f)
+                )
+                renders.add(future)
+                future.add_done_callback(renders.discard)
+
+                # Ograniczenie liczby plików czekających na renderowanie (pamięć)
+                while len(renders) >= workers * 2:
+                    await asyncio.wait(renders, return_when=asyncio.FIRST_COMPLETED)
+
+            if renders:
+                await asyncio.wait(renders)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "files": len(chunks),
+        "files_skipped": skipped,
+        "labels": labels,
+        "wall_seconds": round(elapsed, 3),
+        "catalog_seconds": round(timings["catalog"], 3),
+        "fetch_seconds": round(timings["fetch"], 3),
+        "render_seconds_cpu": round(timings["render"], 3),
+        "labels_per_second": round(labels / elapsed, 2) if elapsed else 0.0
+    }
+    manifest["stats"] = stats
+    save_manifest(output_dir, manifest)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generowanie etykiet Mat-Poż dla listy indeksów bez interfejsu Streamlit.")
+    parser.add_argument("index_file", help="plik z indeksami (CSV katalogu lub jeden indeks w wierszu)")
+    parser.add_argument("output_dir", help="katalog na pliki PDF i manifest wznawiania")
+    parser.add_argument("--pages-per-file", type=int, default=25, help="liczba stron A4 w jednym pliku PDF")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="liczba procesów renderujących PDF")
+    parser.add_argument("--metrics-file", help="zapis czasów etapów pobierania w formacie Prometheus "
+                                               "(pomiary procesów renderujących: zmienna TRACE_FILE)")
+    args = parser.parse_args()
+
+    indices = read_index_file(args.index_file)
+    if not indices:
+        parser.error(f"Nie znaleziono indeksów w pliku {args.index_file}.")
+
+    stats = asyncio.run(run_batch(indices, args.output_dir, args.pages_per_file, args.workers))
+    print(json.dumps(stats, indent=4))
+
+    if args.metrics_file:
+        with open(args.metrics_file, 'w', encoding='utf-8') as f:
+            f.write(get_tracer().prometheus())
+
+
+if __name__ == "__main__":
+    main()
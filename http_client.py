@@ -0,0 +1,196 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Wspólna warstwa HTTP dla zapytań do sklepu (strony produktów i zdjęcia): pula połączeń keep-alive,
+# limity czasu, ponawianie z losową przerwą i bezpiecznik (circuit breaker) osobno dla każdego hosta.
+# Biblioteki httpx i requests importowane są przy pierwszym użyciu (szybszy start aplikacji).
+
+# Limit czasu (w sekundach) na pojedyncze zapytanie HTTP oraz na nawiązanie połączenia
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+# Liczba połączeń w puli (także utrzymywanych między zapytaniami)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "10"))
+# Liczba ponownych prób po błędzie sieci, przekroczeniu czasu lub odpowiedzi 429/5xx
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+# Przerwa przed kolejną próbą losowana z przedziału [0, HTTP_BACKOFF * 2^próba] (najwyżej HTTP_MAX_BACKOFF sekund)
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+HTTP_MAX_BACKOFF = float(os.getenv("HTTP_MAX_BACKOFF", "10"))
+# Liczba kolejnych błędów, po której zapytania do hosta są wstrzymywane, i czas wstrzymania (w sekundach)
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+
+# Odpowiedzi oznaczające chwilowe przeciążenie lub awarię serwera
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# Błąd zgłaszany bez wysyłania zapytania, gdy bezpiecznik hosta jest otwarty
+class CircuitOpenError(Exception):
+    pass
+
+
+# Bezpiecznik hosta: po BREAKER_FAILURES kolejnych błędach zapytania są odrzucane od razu przez BREAKER_RESET
+# sekund, a potem przepuszczane jest jedno zapytanie próbne - jego powodzenie zamyka bezpiecznik, błąd otwiera
+# go ponownie. Dzięki temu niedostępny sklep nie blokuje generowania na czas wszystkich limitów i ponowień.
+class CircuitBreaker:
+    def __init__(self, host, max_failures=BREAKER_FAILURES, reset=BREAKER_RESET):
+        self.host = host
+        self.max_failures = max_failures
+        self.reset = reset
+        self.failures = 0
+        self.opened_at = None
+        self._probe_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset:
+                return False
+            # Jedno zapytanie próbne naraz; próba, która nie zakończyła się w czasie reset, jest powtarzana
+            if self._probe_at is not None and now - self._probe_at < self.reset:
+                return False
+            self._probe_at = now
+            return True
+
+    def success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                print(f"Host {self.host} znów odpowiada - wznowiono zapytania.")
+            self.failures = 0
+            self.opened_at = None
+            self._probe_at = None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probe_at is not None or (self.opened_at is None and self.failures >= self.max_failures):
+                if self.opened_at is None:
+                    print(f"Host {self.host} nie odpowiada ({self.failures} błędów z rzędu) - "
+                          f"zapytania wstrzymane na {self.reset:.0f} s.")
+                self.opened_at = time.monotonic()
+                self._probe_at = None
+
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "open" if time.monotonic() - self.opened_at < self.reset else "half_open"
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+# Funkcja zwracająca bezpiecznik hosta z podanego adresu (jeden na host i proces)
+def get_breaker(url):
+    host = urlsplit(url).netloc
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host)
+        return breaker
+
+
+# Stan bezpieczników wszystkich hostów (do diagnostyki)
+def breaker_states():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.host: {"state": breaker.state(), "failures": breaker.failures} for breaker in breakers}
+
+
+# Funkcja wyznaczająca przerwę przed kolejną próbą; nagłówek Retry-After serwera jest uwzględniany
+# (nie dłużej niż HTTP_MAX_BACKOFF)
+def retry_delay(attempt, response=None):
+    delay = random.uniform(0, min(HTTP_MAX_BACKOFF, HTTP_BACKOFF * 2 ** attempt))
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    try:
+        delay = max(delay, min(HTTP_MAX_BACKOFF, float(retry_after)))
+    except (TypeError, ValueError):
+        pass
+    return delay
+
+
+# Funkcja tworząca klienta HTTP z pulą połączeń do sklepu (zapytania asynchroniczne)
+def create_http_client():
+    import httpx
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS)
+    )
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+# Funkcja zwracająca wspólną sesję requests z pulą połączeń (zapytania z wątków, np. pobieranie zdjęć)
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                adapter = HTTPAdapter(pool_connections=HTTP_MAX_CONNECTIONS, pool_maxsize=HTTP_MAX_CONNECTIONS)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+# Zapytanie GET przez klienta httpx z ponowieniami i bezpiecznikiem hosta. Odpowiedzi inne niż 429/5xx
+# (także 304 i 404) zwracane są od razu; po wyczerpaniu prób zwracana jest ostatnia odpowiedź
+# albo zgłaszany ostatni błąd sieci.
+async def get_async(client, url, headers=None):
+    import httpx
+    breaker = get_breaker(url)
+    for attempt in range(HTTP_RETRIES + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f"Host {breaker.host} chwilowo nie odpowiada")
+        response = None
+        try:
+            response = await client.get(url, headers=headers)
+        except httpx.TransportError:
+            breaker.failure()
+            if attempt == HTTP_RETRIES:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                breaker.success()
+                return response
+            breaker.failure()
+            if attempt == HTTP_RETRIES:
+                return response
+        await asyncio.sleep(retry_delay(attempt, response))
+
+
+# Synchroniczna wersja get_async (wspólna sesja requests) do użycia w wątkach
+def get_sync(url, headers=None):
+    import requests
+    breaker = get_breaker(url)
+    for attempt in range(HTTP_RETRIES + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f"Host {breaker.host} chwilowo nie odpowiada")
+        response = None
+        try:
+            response = get_session().get(url, headers=headers, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_TIMEOUT))
+        except (requests.ConnectionError, requests.Timeout):
+            breaker.failure()
+            if attempt == HTTP_RETRIES:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                breaker.success()
+                return response
+            breaker.failure()
+            if attempt == HTTP_RETRIES:
+                return response
+        time.sleep(retry_delay(attempt, response))
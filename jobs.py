@@ -0,0 +1,110 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from scrype import generate_pdf_from_indices, create_http_client
+
+# Liczba zadań generowania wykonywanych jednocześnie (wspólnie dla wszystkich sesji)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Liczba zakończonych zadań przechowywanych do odczytu wyniku
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "20"))
+
+
+# Zadanie generowania PDF dla listy indeksów; postęp liczony jest w etykietach
+class Job:
+    def __init__(self, indices):
+        self.id = uuid.uuid4().hex
+        self.indices = list(indices)
+        self.key = tuple(indices)
+        self.status = "queued"
+        self.total = len(indices)
+        self.done = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def advance(self):
+        self.done += 1
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+
+# Kolejka zadań współdzielona przez wszystkie sesje aplikacji. Zadania wykonywane są w jednej pętli
+# zdarzeń w wątku tła, więc limity połączeń do sklepu (wspólny klient HTTP) i zapytań do OpenAI
+# (SummaryService tej pętli) obowiązują globalnie, a identyczne zgłoszenia są łączone.
+class JobQueue:
+    def __init__(self, workers=JOB_WORKERS, history=JOB_HISTORY):
+        self.history = history
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._loop = asyncio.new_event_loop()
+        self._slots = asyncio.Semaphore(workers)
+        self._client = None
+        threading.Thread(target=self._loop.run_forever, name="label-jobs", daemon=True).start()
+
+    # Dodanie zadania; jeśli identyczna lista indeksów jest już w kolejce lub w trakcie, zwraca jej zadanie
+    def submit(self, indices):
+        key = tuple(indices)
+        with self._lock:
+            job_id = self._active.get(key)
+            if job_id is not None:
+                return job_id
+            job = Job(indices)
+            self._jobs[job.id] = job
+            self._active[key] = job.id
+        asyncio.run_coroutine_threadsafe(self._run(job), self._loop)
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    # Liczba zadań oczekujących na rozpoczęcie (bez wykonywanych)
+    def pending(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status == "queued")
+
+    async def _run(self, job):
+        async with self._slots:
+            if self._client is None:
+                self._client = create_http_client()
+            job.status = "running"
+            try:
+                job.result = await generate_pdf_from_indices(job.indices, None, progress=job.advance, client=self._client)
+                job.status = "done"
+            except Exception as e:
+                print(f"Błąd zadania generowania {job.id}: {e}")
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                with self._lock:
+                    self._active.pop(job.key, None)
+                    self._prune()
+
+    # Usunięcie najstarszych zakończonych zadań ponad limit historii
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+
+# Funkcja zwracająca wspólną kolejkę zadań (jedna na proces)
+def get_job_queue():
+    global _default_queue
+    if _default_queue is None:
+        with _default_queue_lock:
+            if _default_queue is None:
+                _default_queue = JobQueue()
+    return _default_queue
@@ -0,0 +1,108 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Lokalny serwer zgodny z API OpenAI (/v1/chat/completions) do testów i benchmarków.
+# Użycie: python mock_openai.py --port 8001 --latency 0.8
+#         OPENAI_API_BASE=http://127.0.0.1:8001/v1 OPENAI_API_KEY=test streamlit run app.py
+
+
+# Funkcja tworząca sztuczne podsumowanie (pierwsze słowa opisu)
+def fake_summary(text, words=47):
+    return " ".join(text.split()[:words]) or "Brak opisu produktu"
+
+
+# Funkcja budująca treść odpowiedzi na podstawie polecenia użytkownika.
+# faulty_batches - odpowiedzi wsadowe bez ostatniego opisu i z pierwszym id powtórzonym z cudzym podsumowaniem
+def build_answer(body, faulty_batches=False):
+    content = body["messages"][-1]["content"]
+    if body.get("response_format", {}).get("type") == "json_object":
+        # Polecenie wsadowe - lista opisów w formacie JSON na końcu wiadomości
+        items = json.loads(content[content.index("\n\n[") + 2:])
+        summaries = [{"id": item["id"], "summary": fake_summary(item["text"])} for item in items]
+        if faulty_batches and len(summaries) > 1:
+            summaries = summaries[:-1] + [{"id": items[0]["id"], "summary": fake_summary(items[-1]["text"])}]
+        return json.dumps({"summaries": summaries}, ensure_ascii=False)
+    return fake_summary(content.split("\n\n", 1)[-1])
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    rate_limit_every = 0
+    faulty_batches = False
+    requests_served = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+
+        with MockOpenAIHandler.lock:
+            MockOpenAIHandler.requests_served += 1
+            served = MockOpenAIHandler.requests_served
+
+        # Symulacja przekroczenia limitu zapytań co N-te zapytanie
+        if self.rate_limit_every and served % self.rate_limit_every == 0:
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                            headers={"Retry-After": "1"})
+            return
+
+        time.sleep(self.latency * random.uniform(0.8, 1.2))
+        self._send_json(200, {
+            "id": f"chatcmpl-mock-{served}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": build_answer(body, self.faulty_batches)},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        })
+
+
+# Funkcja uruchamiająca serwer w wątku tła; zwraca obiekt serwera (server.shutdown() kończy pracę)
+def start_mock_openai(port=0, latency=0.0, rate_limit_every=0, faulty_batches=False):
+    handler = type("Handler", (MockOpenAIHandler,), {
+        "latency": latency, "rate_limit_every": rate_limit_every, "faulty_batches": faulty_batches
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokalny serwer imitujący API OpenAI.")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5, help="opóźnienie odpowiedzi w sekundach")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="co które zapytanie zwracać błąd 429")
+    parser.add_argument("--faulty-batches", action="store_true",
+                        help="odpowiedzi wsadowe z brakującym i zdublowanym opisem")
+    args = parser.parse_args()
+
+    server = start_mock_openai(args.port, args.latency, args.rate_limit_every, args.faulty_batches)
+    print(f"Serwer mock OpenAI: http://127.0.0.1:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
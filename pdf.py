@@ -1,10 +1,23 @@
+import copy
+import ctypes
+import gc
+import hashlib
 import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from fpdf import FPDF
-from fpdf.enums import XPos, YPos
-import requests
-from PIL import Image
+from fpdf.enums import Align
+from fpdf.fonts import TTFFont, SubsetMap
+from fpdf.line_break import TextLine
 from io import BytesIO
 import segno
+from fontTools import ttLib
+from assets import BASE_DIR, PRODUCT_IMAGE_WIDTH, get_static_asset, get_product_image
+from pdf_merge import merge_pdf_files
+from tracing import span
 
 # Funkcja do wczytywania danych z pliku JSON
 def load_data_from_json(file_path):
@@ -12,156 +25,458 @@ def load_data_from_json(file_path):
         data = json.load(json_file)
     return data
 
-# Funkcja do rysowania linii przerywanej
+# Funkcja do rysowania linii przerywanej (jedna linia z wzorem przerywania zamiast wielu odcinków)
 def draw_dashed_line(pdf, x1, y1, x2, y2, dash_length=5, gap_length=3):
-    if x1 == x2:
-        y = y1
-        while y < y2:
-            pdf.line(x1, y, x1, min(y + dash_length, y2))
-            y += dash_length + gap_length
-    elif y1 == y2:
-        x = x1
-        while x < x2:
-            pdf.line(x, y1, min(x + dash_length, x2), y1)
-            x += dash_length + gap_length
+    pdf.set_dash_pattern(dash=dash_length, gap=gap_length)
+    pdf.line(x1, y1, x2, y2)
+    pdf.set_dash_pattern()
+
+# Liczba kodów QR i układów tekstu etykiet zapamiętywanych w procesie (ponowny druk tego samego produktu)
+QR_CACHE_ITEMS = int(os.getenv("QR_CACHE_ITEMS", "2048"))
+LAYOUT_CACHE_ITEMS = int(os.getenv("LAYOUT_CACHE_ITEMS", "2048"))
+# Limit pamięci (w MB) na dane budowanego dokumentu PDF (zdjęcia i treść stron). Po jego przekroczeniu gotowe
+# strony zapisywane są na dysk jako fragment, a na końcu fragmenty łączone są w jeden plik (0 = bez limitu).
+# Zapis dokumentu przez fpdf2 wymaga chwilowo około dwukrotności tej wielkości. Każdy fragment zawiera własne
+# podzbiory fontów, więc bardzo mały limit (wiele fragmentów) powiększa plik o ok. 2 KB na fragment.
+PDF_MEMORY_MB = float(os.getenv("PDF_MEMORY_MB", "32"))
+# Kod QR rysowany wektorowo (prostokąty) zamiast osadzania obrazu PNG
+QR_VECTOR = os.getenv("QR_VECTOR", "") == "1"
+# Szerokość marginesu wokół kodu QR (w modułach) - jak w obrazie PNG z segno
+QR_BORDER = 4
+
+
+# Funkcja kodująca QR kod dla URL do PNG (wynik zapamiętywany dla kolejnych etykiet)
+@lru_cache(maxsize=QR_CACHE_ITEMS)
+def qr_png(url):
+    with span("qr"):
+        out = BytesIO()
+        segno.make(url).save(out, kind="png", scale=2)
+    return out.getvalue()
+
 
 # Funkcja generująca QR kod dla URL
 def generate_qr_code(url):
-    qr = segno.make(url)
-    img_byte_arr = BytesIO()
-    qr.save(img_byte_arr, kind="png", scale=2)
-    img_byte_arr.seek(0)
-    return img_byte_arr
-
-# Funkcja tworząca plik PDF na podstawie danych z JSON
-def create_pdf_with_grid(data, output_file="products.pdf"):
+    return BytesIO(qr_png(url))
+
+
+# Funkcja zamieniająca macierz kodu QR na prostokąty ciemnych modułów (kolumna, wiersz, szerokość, wysokość);
+# poziome odcinki o tym samym położeniu w kolejnych wierszach łączone są w jeden prostokąt
+@lru_cache(maxsize=QR_CACHE_ITEMS)
+def qr_rects(url):
+    with span("qr"):
+        matrix = segno.make(url).matrix
+        rects = []
+        open_rects = {}
+        for row, values in enumerate(matrix):
+            runs = []
+            start = None
+            for col, value in enumerate(list(values) + [0]):
+                if value and start is None:
+                    start = col
+                elif not value and start is not None:
+                    runs.append((start, col - start))
+                    start = None
+
+            current = {}
+            for run in runs:
+                rect = open_rects.get(run)
+                if rect is not None:
+                    rect[3] += 1
+                else:
+                    rect = [run[0], row, run[1], 1]
+                    rects.append(rect)
+                current[run] = rect
+            open_rects = current
+    return len(matrix), tuple(tuple(rect) for rect in rects)
+
+
+# Funkcja rysująca kod QR o boku size - wektorowo (QR_VECTOR=1) lub jako obraz PNG
+def draw_qr_code(pdf, x, y, size, url):
+    if not QR_VECTOR:
+        pdf.image(generate_qr_code(url), x=x, y=y, w=size, h=size)
+        return
+
+    modules, rects = qr_rects(url)
+    module = size / (modules + 2 * QR_BORDER)
+    origin_x, origin_y = x + QR_BORDER * module, y + QR_BORDER * module
+    pdf.set_fill_color(*BLACK)
+    for col, row, width, height in rects:
+        pdf.rect(origin_x + col * module, origin_y + row * module, width * module, height * module, style="F")
+
+# Wymiary strony A4 i siatki etykiet (w mm)
+page_width = 210
+page_height = 297
+mid_width = page_width / 2
+mid_height = page_height / 2
+line_margin = 5
+logo_width, logo_height = 30, 10
+quarter_width = page_width / 2
+line_length = quarter_width - 2 * line_margin
+
+# Liczba etykiet na stronie
+LABELS_PER_PAGE = 4
+
+# Położenie lewego górnego rogu kolejnych etykiet na stronie
+LABEL_POSITIONS = [
+    (4, 4),
+    (mid_width + 4, 4),
+    (4, mid_height + 4),
+    (mid_width + 4, mid_height + 4),
+]
+
+
+# Kolory używane na etykiecie
+RED = (237, 0, 35)
+BLUE = (46, 74, 155)
+BLACK = (0, 0, 0)
+GRAY = (88, 88, 88)
+
+# Szablon etykiety - położenie elementów względem lewego górnego rogu etykiety (w mm)
+text_x = ((quarter_width - line_length) / 2) - 4
+rule_y = logo_height + 2
+qr_y = rule_y + 20
+qr_size = 35
+producer_y = quarter_width + 30
+
+# Elementy stałe - identyczne na każdej etykiecie, rysowane raz na stronę dla wszystkich etykiet
+STATIC_ELEMENTS = [
+    {"kind": "image", "asset": "logo.png", "x": 0, "y": 0, "w": logo_width, "h": logo_height},
+    {"kind": "line", "x": text_x, "y": rule_y, "w": line_length, "color": RED},
+    {"kind": "text", "text": "Cena brutto:", "x": text_x, "y": qr_y + 34, "w": line_length, "h": 10,
+     "font": ("Poppins", 12), "color": BLACK},
+]
+
+# Pola zmienne - wypełniane danymi produktu
+FIELDS = {
+    "qr": {"x": text_x - 2.5, "y": qr_y, "w": qr_size, "h": qr_size},
+    "image": {"x": text_x + line_length - 2 - PRODUCT_IMAGE_WIDTH, "y": qr_y, "w": PRODUCT_IMAGE_WIDTH},
+    "name": {"x": text_x, "y": rule_y, "w": line_length, "h": 6, "max_lines": 3, "area_h": qr_y - rule_y,
+             "font": ("Poppins-Bold", 12), "color": BLUE},
+    "price": {"x": text_x, "y": qr_y + 40, "w": line_length, "h": 10, "font": ("Poppins-Bold", 18), "color": RED},
+    "index": {"x": text_x, "y": qr_y + 45, "w": line_length, "h": 10, "font": ("Poppins", 8), "color": GRAY},
+    # Opis zaczyna się 6 mm pod zdjęciem (lub pod kodem QR, gdy zdjęcia brak)
+    "description": {"x": text_x, "y": qr_y + 6, "w": line_length, "h": 6, "font": ("Poppins", 9.6), "color": BLACK},
+    "producer_line": {"x": text_x, "y": producer_y, "w": line_length, "color": BLUE},
+    "producer_caption": {"x": text_x, "y": producer_y, "w": line_length, "h": 6, "font": ("Poppins", 10),
+                         "color": BLACK, "text": "Producent: "},
+    "producer": {"x": text_x + 21, "y": producer_y, "w": line_length, "h": 6, "font": ("Poppins", 10), "color": RED},
+}
+
+
+# Funkcja kompilująca elementy stałe do listy operacji z bezwzględnymi współrzędnymi dla całej strony.
+# Operacje są pogrupowane według elementu, więc font i kolor ustawiane są raz na stronę, a nie raz na etykietę.
+def compile_page_template(positions=LABEL_POSITIONS):
+    operations = [("grid", None, [
+        (mid_width, 0, mid_width, page_height),
+        (0, mid_height, page_width, mid_height),
+    ])]
+    for element in STATIC_ELEMENTS:
+        coords = [(x + element["x"], y + element["y"]) for x, y in positions]
+        operations.append((element["kind"], element, coords))
+    return operations
+
+
+# Szablony stron dla 0-4 etykiet - na niepełnej stronie elementy stałe rysowane są tylko w zajętych miejscach
+PAGE_TEMPLATES = [compile_page_template(LABEL_POSITIONS[:count]) for count in range(LABELS_PER_PAGE + 1)]
+PAGE_TEMPLATE = PAGE_TEMPLATES[LABELS_PER_PAGE]
+
+
+# Funkcja ustawiająca font i kolor tekstu pola szablonu
+def apply_text_style(pdf, field):
+    family, size = field["font"]
+    pdf.set_font(family, size=size)
+    pdf.set_text_color(*field["color"])
+
+
+# Funkcja rysująca elementy stałe całej strony na podstawie skompilowanego szablonu
+def draw_page_template(pdf, template=PAGE_TEMPLATE):
+    for kind, element, coords in template:
+        if kind == "grid":
+            pdf.set_draw_color(128, 128, 128)
+            pdf.set_line_width(0.1)
+            for x1, y1, x2, y2 in coords:
+                draw_dashed_line(pdf, x1, y1, x2, y2)
+        elif kind == "image":
+            # Logo osadzane jest w dokumencie raz i wielokrotnie przywoływane
+            data = get_static_asset(element["asset"])
+            for x, y in coords:
+                pdf.image(BytesIO(data), x=x, y=y, w=element["w"], h=element["h"])
+        elif kind == "line":
+            pdf.set_draw_color(*element["color"])
+            for x, y in coords:
+                pdf.line(x, y, x + element["w"], y)
+        elif kind == "text":
+            apply_text_style(pdf, element)
+            for x, y in coords:
+                pdf.set_xy(x, y)
+                pdf.cell(element["w"], element["h"], element["text"])
+
+
+# Fonty etykiet: rodzina -> plik TTF
+LABEL_FONTS = {"Poppins": "Poppins-Regular.ttf", "Poppins-Bold": "Poppins-Bold.ttf"}
+
+
+# Funkcja wczytująca font TTF raz na proces: metryki, szerokości znaków i mapa glifów (to samo co add_font)
+@lru_cache(maxsize=None)
+def load_font(family, file_name):
+    with span("font_load"):
+        font = TTFFont(FPDF(), os.path.join(BASE_DIR, file_name), family.lower(), "")
+        font.ttfont.close()
+    return font
+
+
+# Funkcja rejestrująca font w dokumencie bez ponownego parsowania pliku - odpowiednik pdf.add_font.
+# Dokument dostaje kopię wczytanego fontu z własnym zestawem użytych znaków i własnym obiektem fontTools,
+# bo przy zapisie fpdf2 osadza podzbiór tylko użytych glifów, modyfikując ten obiekt (i deskryptor fontu).
+def add_label_font(pdf, family, file_name):
+    font = copy.copy(load_font(family, file_name))
+    font.i = len(pdf.fonts) + 1
+    font.desc = copy.copy(font.desc)
+    font.ttfont = ttLib.TTFont(BytesIO(get_static_asset(file_name)), recalcTimestamp=False, fontNumber=0, lazy=True)
+    font.missing_glyphs = []
+    chars = "\x00 \r\n"
+    if pdf.str_alias_nb_pages:
+        chars += "0123456789" + pdf.str_alias_nb_pages
+    font.subset = SubsetMap(font, [ord(char) for char in chars])
+    pdf.fonts[font.fontkey] = font
+
+
+# Funkcja tworząca pusty dokument PDF z zarejestrowanymi fontami
+def new_label_pdf():
     pdf = FPDF(orientation='P', unit='mm', format='A4')
-    pdf.add_page()
-    pdf.add_font("Poppins", "", "Poppins-Regular.ttf")
-    pdf.add_font("Poppins-Bold", "", "Poppins-Bold.ttf")
+    for family, file_name in LABEL_FONTS.items():
+        add_label_font(pdf, family, file_name)
     pdf.set_font("Poppins", size=12)
+    pdf.set_margins(0, 0, 0)
+    pdf.set_auto_page_break(auto=False)
+    return pdf
+
+
+_layouts = OrderedDict()
+_layouts_lock = threading.Lock()
+
+
+# Funkcja dzieląca tekst pola na linie i mierząca każdą linię: (tekst, szerokość, liczba spacji, wyjustowana)
+def measure_lines(pdf, field, text, align="L", max_lines=None):
+    apply_text_style(pdf, field)
+    lines = pdf.multi_cell(field["w"], field["h"], text, align=align, dry_run=True, output="LINES")
+    if max_lines:
+        lines = lines[:max_lines]
+    # multi_cell nie justuje ostatniej linii akapitu
+    return [
+        (line, pdf.get_string_width(line), line.count(" "), align == "J" and i < len(lines) - 1)
+        for i, line in enumerate(lines)
+    ]
+
+
+# Funkcja mierząca tekst jednowierszowy (jak cell() - bez zawijania)
+def measure_line(pdf, field, text):
+    apply_text_style(pdf, field)
+    return text, pdf.get_string_width(text), text.count(" "), False
+
+
+# Funkcja wyznaczająca układ tekstu etykiety: lista (pole, x, y, linia) względem lewego górnego rogu etykiety
+def layout_label_text(pdf, product, image_height):
+    items = []
+
+    # Nazwa produktu: maks. 3 linie, wyśrodkowane w pionie nad grafikami
+    field = FIELDS["name"]
+    name_lines = measure_lines(pdf, field, product["name"], max_lines=field["max_lines"])
+    name_y = field["y"] + (field["area_h"] - field["h"] * len(name_lines)) / 2
+    for i, line in enumerate(name_lines):
+        items.append(("name", field["x"], name_y + i * field["h"], line))
+
+    for key, text in (("price", product["price"]), ("index", f"Indeks: {product.get('index', '')}")):
+        field = FIELDS[key]
+        items.append((key, field["x"], field["y"], measure_line(pdf, field, text)))
+
+    field = FIELDS["description"]
+    for i, line in enumerate(measure_lines(pdf, field, f"     {product['summary_description']}", align="J")):
+        items.append(("description", field["x"], field["y"] + image_height + i * field["h"], line))
+
+    if product["producer"] != "Brak producenta":
+        for key, text in (("producer_caption", FIELDS["producer_caption"]["text"]), ("producer", product["producer"])):
+            field = FIELDS[key]
+            items.append((key, field["x"], field["y"], measure_line(pdf, field, text)))
+    return tuple(items)
+
+
+# Funkcja zwracająca układ tekstu etykiety z pamięci (klucz: treść etykiety i wysokość zdjęcia) lub mierząca go
+def get_label_layout(pdf, product, image_height):
+    key = hashlib.sha256(json.dumps([
+        product["name"], product["price"], product.get("index", ""), product["summary_description"],
+        product["producer"], round(image_height, 4)
+    ], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    with _layouts_lock:
+        layout = _layouts.get(key)
+        if layout is not None:
+            _layouts.move_to_end(key)
+            return layout
+
+    with span("layout"):
+        layout = layout_label_text(pdf, product, image_height)
+    with _layouts_lock:
+        _layouts[key] = layout
+        while len(_layouts) > LAYOUT_CACHE_ITEMS:
+            _layouts.popitem(last=False)
+    return layout
+
+
+# Funkcja rysująca zmierzoną wcześniej linię tekstu bez ponownego pomiaru szerokości znaków.
+# Korzysta z wewnętrznego API fpdf2 (TextLine) - wersja fpdf2 jest przypięta w requirements.txt.
+def draw_text_line(pdf, x, y, field, line):
+    text, width, spaces, justify = line
+    pdf.set_xy(x, y)
+    pdf._render_styled_text_line(
+        TextLine(
+            pdf._preload_font_styles(text, False),
+            text_width=width,
+            number_of_spaces=spaces,
+            align=Align.J if justify else Align.L,
+            height=field["h"],
+            max_width=field["w"],
+            trailing_nl=False
+        ),
+        field["h"]
+    )
+
+
+# Funkcja rysująca pola zmienne pojedynczej etykiety produktu
+def add_logo_and_line(pdf, x, y, product):
+    image_url = product["image_url"]
+
+    # Najpierw umieszczamy kod QR i zdjęcie (będą "pod spodem")
+    field = FIELDS["qr"]
+    draw_qr_code(pdf, x + field["x"], y + field["y"], field["w"], product["product_url"])
+
+    # Bez zdjęcia opis zaczyna się pod kodem QR
+    image_height = qr_size
+    with span("image"):
+        image = get_product_image(image_url, PRODUCT_IMAGE_WIDTH) if image_url else None
+        if image:
+            field = FIELDS["image"]
+            image_height = field["w"] * image.height / image.width
+            pdf.image(BytesIO(image.data), x=x + field["x"], y=y + field["y"], w=field["w"], h=image_height)
+
+    # Tekst etykiety: układ (podział na linie i szerokości) mierzony raz dla danej treści
+    style = None
+    for key, dx, dy, line in get_label_layout(pdf, product, image_height):
+        if key != style:
+            apply_text_style(pdf, FIELDS[key])
+            style = key
+        draw_text_line(pdf, x + dx, y + dy, FIELDS[key], line)
+
+    if product["producer"] != "Brak producenta":
+        field = FIELDS["producer_line"]
+        pdf.set_draw_color(*field["color"])
+        pdf.line(x + field["x"], y + field["y"], x + field["x"] + field["w"], y + field["y"])
+
+
+# Funkcja dodająca do dokumentu stronę z maksymalnie czterema etykietami
+def add_label_page(pdf, products):
+    with span("render_page", labels=len(products)):
+        pdf.add_page()
+        draw_page_template(pdf, PAGE_TEMPLATES[len(products)])
+
+        for (x, y), product in zip(LABEL_POSITIONS, products):
+            add_logo_and_line(pdf, x, y, product)
+
+
+# Funkcja zapisująca dokument do pliku (ścieżka lub obiekt plikowy, np. BytesIO);
+# bez output_file zwraca zawartość PDF jako bytes
+def write_pdf(pdf, output_file=None):
+    with span("pdf_output", pages=pdf.page):
+        if output_file is None:
+            return bytes(pdf.output())
+        pdf.output(output_file)
+    if isinstance(output_file, str):
+        print(f"PDF utworzony jako '{output_file}'.")
+    return None
+
+
+# Funkcja szacująca wielkość danych dokumentu trzymanych w pamięci: osadzone obrazy i treść stron (w bajtach)
+def estimate_pdf_size(pdf):
+    images = sum(len(info["data"]) for info in pdf.image_cache.images.values())
+    return images + sum(len(page.contents) for page in pdf.pages.values())
+
+
+# Funkcja zwalniająca pamięć zapisanego fragmentu. Dokument fpdf2 zawiera cykle odwołań, więc bez gc.collect()
+# czekałby na rzadkie pełne odśmiecanie; glibc zatrzymuje zwolnioną pamięć w arenach wątków renderujących
+# (asyncio.to_thread), malloc_trim oddaje ją systemowi (na systemach bez glibc ten krok jest pomijany).
+def release_memory():
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+# Dokument etykiet o ograniczonym zużyciu pamięci. Strony trafiają do bieżącego dokumentu fpdf2, a gdy jego dane
+# przekroczą limit, jest on zapisywany do pliku tymczasowego jako fragment i zaczynany jest nowy. close() łączy
+# fragmenty strumieniowo (pdf_merge.py); dokument mieszczący się w limicie zapisywany jest bez zmian przez write_pdf.
+class LabelDocument:
+    def __init__(self, memory_mb=PDF_MEMORY_MB):
+        self.max_bytes = memory_mb * 1024 * 1024
+        self.pdf = new_label_pdf()
+        self.page = 0
+        self.parts = []
+        self._tmp_dir = None
+
+    def add_page(self, products):
+        add_label_page(self.pdf, products)
+        self.page += 1
+        if self.max_bytes and estimate_pdf_size(self.pdf) >= self.max_bytes:
+            self._flush()
+
+    def _flush(self):
+        # Katalog tymczasowy usuwany jest także wtedy, gdy dokument zostanie porzucony (np. po błędzie)
+        if self._tmp_dir is None:
+            self._tmp_dir = tempfile.TemporaryDirectory(prefix="labels_")
+        path = os.path.join(self._tmp_dir.name, f"part_{len(self.parts):04d}.pdf")
+        with open(path, "wb") as f:
+            write_pdf(self.pdf, f)
+        self.parts.append(path)
+        self.pdf = new_label_pdf()
+        release_memory()
+
+    # Zapis dokumentu (jak write_pdf: ścieżka, obiekt plikowy lub None - wtedy zwraca bytes) i usunięcie fragmentów
+    def close(self, output_file=None):
+        try:
+            if not self.parts:
+                return write_pdf(self.pdf, output_file)
+            if self.pdf.page:
+                self._flush()
+            with span("pdf_merge", parts=len(self.parts), pages=self.page):
+                if output_file is None:
+                    out = BytesIO()
+                    merge_pdf_files(self.parts, out)
+                    return out.getvalue()
+                if not isinstance(output_file, (str, os.PathLike)):
+                    merge_pdf_files(self.parts, output_file)
+                    return None
+                with open(output_file, "wb") as f:
+                    merge_pdf_files(self.parts, f)
+            print(f"PDF utworzony jako '{output_file}' ({len(self.parts)} fragmentów).")
+            return None
+        finally:
+            if self._tmp_dir is not None:
+                self._tmp_dir.cleanup()
+                self._tmp_dir = None
+
+
+# Funkcja tworząca plik PDF na podstawie danych z JSON (po 4 etykiety na stronę)
+def create_pdf_with_grid(data, output_file="products.pdf", memory_mb=PDF_MEMORY_MB):
+    with span("create_pdf", labels=len(data)):
+        document = LabelDocument(memory_mb)
+
+        page_products = []
+        for product in data:
+            page_products.append(product)
+            if len(page_products) == LABELS_PER_PAGE:
+                document.add_page(page_products)
+                page_products = []
+        if page_products or document.page == 0:
+            document.add_page(page_products)
 
-    pdf.set_draw_color(128, 128, 128)
-    pdf.set_line_width(0.1)
-    page_width = 210
-    page_height = 297
-    mid_width = page_width / 2
-    mid_height = page_height / 2
-    line_margin = 5
-
-    draw_dashed_line(pdf, mid_width, 0, mid_width, page_height)
-    draw_dashed_line(pdf, 0, mid_height, page_width, mid_height)
-
-    logo_path = "logo.png"
-    logo_width, logo_height = 30, 10
-    quarter_width = page_width / 2
-    line_length = quarter_width - 2 * line_margin
-
-    def add_logo_and_line(x, y, product):
-        product_name = product["name"]
-        price = product["price"]
-        description = product["summary_description"]
-        producer = product["producer"]
-        image_url = product["image_url"]
-        product_url = product["product_url"]
-
-        # Reset pozycji Y przed każdym nowym elementem
-        pdf.set_y(y)
-
-        pdf.image(logo_path, x=x, y=y, w=logo_width, h=logo_height)
-        pdf.set_margins(0, 0, 0)
-        pdf.set_auto_page_break(auto=False)
-
-        pdf.set_draw_color(237, 0, 35)
-        pdf.set_line_width(0.1)
-        line_x_start = x + ((quarter_width - line_length) / 2) - 4
-        line_y_position = y + logo_height + 2
-        pdf.line(line_x_start, line_y_position, line_x_start + line_length, line_y_position)
-
-        # Generowanie QR kodu
-        qr_img = generate_qr_code(product_url)
-        qr_x_position = line_x_start - 2.5
-        qr_y_position = line_y_position + 20
-
-        # Najpierw generujemy i umieszczamy kod QR i zdjęcie (będą "pod spodem")
-        pdf.image(qr_img, x=qr_x_position, y=qr_y_position, w=35, h=35)
-
-        if image_url:
-            response = requests.get(image_url)
-            img = Image.open(BytesIO(response.content))
-            img_ratio = img.height / img.width
-            max_width = quarter_width / 2
-            new_width = max_width
-            new_height = new_width * img_ratio
-            img_y_position = qr_y_position
-            pdf.image(image_url, x=line_x_start + line_length - 2 - new_width, y=img_y_position, w=new_width,
-                      h=new_height)
-
-        # Obliczanie wysokości tekstu nazwy produktu
-        pdf.set_font("Poppins-Bold", size=12)
-        name_max_width = line_length
-        name_line_height = 6
-        name_text_lines = pdf.multi_cell(name_max_width, name_line_height, product_name, dry_run=True, output="LINES")
-
-        # Ograniczenie liczby linii do 3
-        if len(name_text_lines) > 3:
-            name_text_lines = name_text_lines[:3]
-            product_name = '\n'.join(name_text_lines)
-
-        name_text_height = name_line_height * len(name_text_lines)
-
-        # Obliczanie środkowej pozycji dla nazwy produktu
-        available_space = qr_y_position - line_y_position  # Przestrzeń między linią a grafikami
-        name_y_position = line_y_position + (available_space - name_text_height) / 2
-
-        # Wyświetlanie nazwy produktu (będzie "na wierzchu")
-        pdf.set_font("Poppins-Bold", size=12)
-        pdf.set_text_color(46, 74, 155)
-        pdf.set_xy(line_x_start, name_y_position)
-        pdf.multi_cell(name_max_width, name_line_height, product_name, align="L")
-
-        pdf.set_font("Poppins", size=12)
-        pdf.set_text_color(0, 0, 0)
-        pdf.set_xy(line_x_start, qr_y_position + 34)
-        pdf.cell(line_length, 10, "Cena brutto:", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        pdf.set_xy(line_x_start, qr_y_position + 40)
-        pdf.set_text_color(237, 0, 35)
-        pdf.set_font("Poppins-Bold", size=18)
-        pdf.cell(line_length, 10, price, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-
-        pdf.set_font("Poppins", size=8)
-        pdf.set_text_color(88, 88, 88)
-        pdf.set_xy(line_x_start, qr_y_position + 45)
-        pdf.cell(line_length, 10, f"Indeks: {product.get('index', '')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-
-        pdf.set_font("Poppins", size=9.6)
-        pdf.set_text_color(0, 0, 0)
-        pdf.set_xy(line_x_start, qr_y_position + new_height + 6)
-        pdf.multi_cell(line_length, 6, f"     {description}", align="J")
-
-        if producer != "Brak producenta":
-            blue_line_y_position = y + quarter_width + 30
-            pdf.set_draw_color(46, 74, 155)
-            pdf.line(line_x_start, blue_line_y_position, line_x_start + line_length, blue_line_y_position)
-
-            pdf.set_font("Poppins", size=10)
-            pdf.set_text_color(0, 0, 0)
-            pdf.set_xy(line_x_start, blue_line_y_position)
-            pdf.cell(line_length, 6, "Producent: ", new_x=XPos.RIGHT, new_y=YPos.TOP)
-
-            pdf.set_text_color(237, 0, 35)
-            pdf.set_xy(line_x_start + 21, blue_line_y_position)
-            pdf.cell(line_length, 6, producer, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-
-    for i, product in enumerate(data):
-        if i == 0:
-            add_logo_and_line(4, 4, product)
-        elif i == 1:
-            add_logo_and_line(mid_width + 4, 4, product)
-        elif i == 2:
-            add_logo_and_line(4, mid_height + 4, product)
-        elif i == 3:
-            add_logo_and_line(mid_width + 4, mid_height + 4, product)
-
-    pdf.output(output_file)
-    print(f"PDF utworzony jako '{output_file}'.")
\ No newline at end of file
+        return document.close(output_file)
\ No newline at end of file
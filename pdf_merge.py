@@ -0,0 +1,161 @@
+import hashlib
+import re
+
+# Łączenie plików PDF zapisanych przez fpdf2 (etykiety renderowane fragmentami) w jeden dokument.
+# Obiekty kopiowane są z plików źródłowych pojedynczo, więc w pamięci jest naraz tylko jeden obiekt
+# (np. jedno zdjęcie), niezależnie od liczby stron. Identyczne obiekty bez odwołań do innych obiektów
+# (zdjęcia, logo) zapisywane są raz - tak jak fpdf2 robi to w obrębie jednego dokumentu. Podzbiory fontów
+# różnią się między plikami (inne znaki), więc każdy plik wnosi własne - połączony dokument jest większy
+# od renderowanego w całości o ok. 2 KB na każdy dodatkowy plik (przy PDF_MEMORY_MB=32 pomijalnie).
+# Obsługiwany jest układ pliku zapisywany przez fpdf2: klasyczna tablica xref, drzewo stron z jednym
+# węzłem /Pages i bez strumieni obiektów.
+
+REFERENCE = re.compile(rb"(?<![\d.])(\d+) 0 R")
+HEADER = re.compile(rb"%PDF-(\d+)\.(\d+)")
+
+
+# Funkcja zwracająca wersję PDF z nagłówka pliku jako (główna, poboczna) - fpdf2 zapisuje 1.3,
+# a 1.4 dla dokumentów ze zdjęciami z kanałem przezroczystości
+def read_version(path):
+    with open(path, "rb") as f:
+        match = HEADER.match(f.read(16))
+    return (int(match.group(1)), int(match.group(2))) if match else (1, 3)
+
+
+# Funkcja odczytująca tablicę xref i trailer pliku; zwraca (słownik numer -> przesunięcie, przesunięcie xref, trailer)
+def read_xref(f):
+    f.seek(0, 2)
+    size = f.tell()
+    f.seek(max(0, size - 1024))
+    tail = f.read()
+    match = re.search(rb"startxref\s+(\d+)\s+%%EOF", tail)
+    if match is None:
+        raise ValueError("Nie znaleziono tablicy xref - plik nie pochodzi z fpdf2.")
+    xref_offset = int(match.group(1))
+
+    f.seek(xref_offset)
+    data = f.read(size - xref_offset)
+    if not data.startswith(b"xref"):
+        raise ValueError("Nieobsługiwany format tablicy xref (strumień xref).")
+    table, trailer = data.split(b"trailer", 1)
+    lines = table.split(b"\n")[1:]
+    offsets = {}
+    first, count = (int(value) for value in lines[0].split())
+    for number, line in zip(range(first, first + count), lines[1:]):
+        fields = line.split()
+        if len(fields) == 3 and fields[2] == b"n":
+            offsets[number] = int(fields[0])
+    return offsets, xref_offset, trailer
+
+
+# Funkcja zwracająca numer obiektu wskazywanego przez klucz słownika PDF (np. /Root 2 0 R)
+def get_reference(data, key):
+    match = re.search(rb"/" + key + rb"\s+(\d+) 0 R", data)
+    return int(match.group(1)) if match else None
+
+
+# Funkcja dzieląca obiekt na słownik (z odwołaniami do innych obiektów) i surowy strumień danych
+def split_object(data):
+    header_end = data.index(b"obj") + 3
+    body = data[header_end:data.rindex(b"endobj")]
+    stream = body.find(b"stream\n")
+    if stream == -1:
+        return body, b""
+    return body[:stream], body[stream:]
+
+
+# Odczyt obiektów pliku w kolejności występowania: (numer, słownik, strumień)
+def iter_objects(f, offsets, xref_offset):
+    ordered = sorted(offsets.items(), key=lambda item: item[1])
+    for i, (number, offset) in enumerate(ordered):
+        end = ordered[i + 1][1] if i + 1 < len(ordered) else xref_offset
+        f.seek(offset)
+        yield (number, *split_object(f.read(end - offset)))
+
+
+# Funkcja łącząca pliki PDF (ścieżki) w jeden dokument zapisywany do output (plik otwarty w trybie binarnym);
+# zwraca liczbę stron
+def merge_pdf_files(paths, output):
+    position = 0
+
+    def write(data):
+        nonlocal position
+        output.write(data)
+        position += len(data)
+
+    # Obiekty 1-3 to nowe drzewo stron, katalog dokumentu i metadane; skopiowane obiekty mają kolejne numery
+    pages_number, catalog_number, info_number = 1, 2, 3
+    offsets = {}
+    next_number = 4
+    written = {}
+    kids = []
+    media_box = None
+    info = None
+
+    # Wersja dokumentu to najwyższa wersja spośród łączonych plików
+    version = max([read_version(path) for path in paths], default=(1, 3))
+    write(b"%%PDF-%d.%d\n%%\xe2\xe3\xcf\xd3\n" % version)
+    for path in paths:
+        with open(path, "rb") as f:
+            source_offsets, xref_offset, trailer = read_xref(f)
+            root = get_reference(trailer, b"Root")
+            source_info = get_reference(trailer, b"Info")
+            f.seek(source_offsets[root])
+            source_pages = get_reference(f.read(512), b"Pages")
+
+            # Pierwszy przebieg: nadanie nowych numerów; obiekt bez odwołań, który został już zapisany
+            # (z tego lub wcześniejszego pliku), dostaje numer zapisanej kopii
+            renumber = {source_pages: pages_number}
+            duplicates = set()
+            for number, dictionary, stream in iter_objects(f, source_offsets, xref_offset):
+                if number in (root, source_pages, source_info):
+                    continue
+                if REFERENCE.search(dictionary) is None:
+                    digest = hashlib.sha256(dictionary + stream).digest()
+                    if digest in written:
+                        renumber[number] = written[digest]
+                        duplicates.add(number)
+                        continue
+                    written[digest] = next_number
+                renumber[number] = next_number
+                next_number += 1
+
+            # Drugi przebieg: zapis obiektów z poprawionymi odwołaniami
+            for number, dictionary, stream in iter_objects(f, source_offsets, xref_offset):
+                if number == source_pages:
+                    box = re.search(rb"/MediaBox\s*\[[^\]]*\]", dictionary)
+                    box = box.group(0) if box else b""
+                    if media_box is None:
+                        media_box = box
+                    elif box != media_box:
+                        raise ValueError(f"Plik {path} ma inny format strony niż pozostałe.")
+                    page_refs = re.search(rb"/Kids\s*\[([^\]]*)\]", dictionary).group(1)
+                    kids.extend(renumber[int(kid)] for kid in REFERENCE.findall(page_refs))
+                elif number == source_info:
+                    info = info or dictionary
+                elif number != root and number not in duplicates:
+                    dictionary = REFERENCE.sub(lambda match: b"%d 0 R" % renumber[int(match.group(1))], dictionary)
+                    offsets[renumber[number]] = position
+                    write(b"%d 0 obj" % renumber[number] + dictionary + stream + b"endobj\n")
+
+    if not kids:
+        raise ValueError("Brak stron do połączenia.")
+
+    offsets[pages_number] = position
+    write(b"1 0 obj\n<<\n/Count %d\n/Kids [%s]\n%s\n/Type /Pages\n>>\nendobj\n" % (
+        len(kids), b" ".join(b"%d 0 R" % kid for kid in kids), media_box
+    ))
+    offsets[catalog_number] = position
+    write(b"2 0 obj\n<<\n/OpenAction [%d 0 R /FitH null]\n/PageLayout /OneColumn\n/Pages 1 0 R\n"
+          b"/Type /Catalog\n>>\nendobj\n" % kids[0])
+    offsets[info_number] = position
+    write(b"3 0 obj" + (info or b"\n<<\n>>\n") + b"endobj\n")
+
+    xref_position = position
+    write(b"xref\n0 %d\n0000000000 65535 f \n" % next_number)
+    for number in range(1, next_number):
+        write(b"%010d 00000 n \n" % offsets[number])
+    write(b"trailer\n<<\n/Size %d\n/Root 2 0 R\n/Info 3 0 R\n>>\nstartxref\n%d\n%%%%EOF\n" % (
+        next_number, xref_position
+    ))
+    return len(kids)
@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from cache import get_cache
+from catalog import get_catalog, read_index_file
+from scrype import create_http_client, process_product, PRODUCT_TIMEOUT
+
+# Liczba produktów przygotowywanych jednocześnie (pobieranie strony, podsumowanie, zdjęcie)
+PREWARM_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", "16"))
+
+
+# Przygotowanie danych etykiet dla podanych indeksów i zapis w lokalnym magazynie (tabela labels w cache.py).
+# Świeże wpisy są pomijane, chyba że force=True.
+async def prewarm(references, concurrency=PREWARM_CONCURRENCY, force=False):
+    cache = get_cache()
+    entries = get_catalog().get_many(references)
+    located = {reference: entry for reference, entry in entries.items() if entry[0]}
+    fresh = set() if force else set(await asyncio.to_thread(cache.get_labels, located))
+    pending = iter([reference for reference in located if reference not in fresh])
+
+    stats = {"references": len(references), "skipped_fresh": len(fresh), "warmed": 0, "failed": 0}
+    start = time.perf_counter()
+
+    # Pracownik pobierający kolejne indeksy ze wspólnej listy
+    async def worker(client):
+        for reference in pending:
+            url, pic_url = entries[reference]
+            try:
+                label = await asyncio.wait_for(process_product(client, url, pic_url), PRODUCT_TIMEOUT)
+            except Exception as e:
+                print(f"Błąd podczas przygotowania indeksu '{reference}': {type(e).__name__} {e}")
+                stats["failed"] += 1
+                continue
+
+            if label["name"] == "Brak nazwy produktu":
+                print(f"Nie udało się odczytać produktu dla indeksu '{reference}'.")
+                stats["failed"] += 1
+                continue
+            # Etykieta w trybie awaryjnym (sklep lub OpenAI nie odpowiadały) nie trafia do magazynu
+            if label.get("degraded"):
+                print(f"Niepełne dane indeksu '{reference}' ({', '.join(label['degraded'])}) - pominięto.")
+                stats["failed"] += 1
+                continue
+
+            await asyncio.to_thread(cache.put_label, reference, url, label)
+            stats["warmed"] += 1
+            done = stats["warmed"] + stats["failed"]
+            if done % 100 == 0:
+                print(f"Przygotowano {done} z {len(located) - len(fresh)} etykiet.")
+
+    async with create_http_client() as client:
+        await asyncio.gather(*(worker(client) for _ in range(max(1, concurrency))))
+
+    elapsed = time.perf_counter() - start
+    stats["missing_in_catalog"] = len(references) - len(located)
+    stats["seconds"] = round(elapsed, 3)
+    stats["labels_per_second"] = round(stats["warmed"] / elapsed, 2) if elapsed else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Przygotowanie danych etykiet dla całego katalogu przed generowaniem PDF.")
+    parser.add_argument("--index-file", help="przygotuj tylko indeksy z pliku (domyślnie cały katalog)")
+    parser.add_argument("--concurrency", type=int, default=PREWARM_CONCURRENCY, help="liczba produktów przetwarzanych jednocześnie")
+    parser.add_argument("--force", action="store_true", help="odśwież także świeże wpisy")
+    args = parser.parse_args()
+
+    references = read_index_file(args.index_file) if args.index_file else get_catalog().references()
+    if not references:
+        parser.error("Brak indeksów do przygotowania.")
+
+    stats = asyncio.run(prewarm(references, args.concurrency, args.force))
+    print(json.dumps(stats, indent=4))
+
+
+if __name__ == "__main__":
+    main()
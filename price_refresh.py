@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import get_cache
+from catalog import get_catalog, read_index_file
+from cli import load_manifest, save_manifest, render_chunk, RENDER_CONTEXT
+from pdf import LABELS_PER_PAGE
+from scrype import create_http_client, fetch_product_info_async, PRODUCT_TIMEOUT
+
+# Liczba stron produktów sprawdzanych jednocześnie
+PRICE_REFRESH_CONCURRENCY = int(os.getenv("PRICE_REFRESH_CONCURRENCY", "16"))
+
+
+# Odświeżenie ceny (oraz producenta i indeksu) jednej etykiety z magazynu. Strona pobierana jest zapytaniem
+# warunkowym - odpowiedź 304 oznacza brak zmian; nazwa, opis, podsumowanie i zdjęcie etykiety nie są ruszane.
+# Zwraca (etykieta po zmianie lub None, gdy dane się nie zmieniły, czy zmieniła się nazwa lub opis).
+async def refresh_label(client, cache, url, label):
+    info, etag, last_modified, modified = await fetch_product_info_async(client, url, cache.get_validators(url))
+    name, price, description, producer, index = info
+    if not modified:
+        await asyncio.to_thread(cache.touch_product, url)
+    elif name == "Brak nazwy produktu":
+        raise ValueError("nie udało się odczytać produktu ze strony")
+    else:
+        await asyncio.to_thread(cache.put_product, url, info, etag, last_modified)
+
+    content_changed = name != label["name"] or description != label["description"]
+    updated = dict(label, price=price, producer=producer, index=index)
+    return (updated if updated != label else None), content_changed
+
+
+# Odświeżenie cen etykiet zapisanych w magazynie (prewarm.py lub wcześniejsze generowanie) dla podanych indeksów.
+# Etykiety produktów, których nazwa lub opis się zmieniły, są usuwane z magazynu (podsumowanie opisu jest
+# nieaktualne) - przygotuje je od nowa generowanie lub prewarm.py.
+# Zwraca statystyki oraz listę indeksów, których etykiety się zmieniły lub zostały usunięte.
+async def refresh_prices(references, concurrency=PRICE_REFRESH_CONCURRENCY):
+    cache = get_cache()
+    entries = get_catalog().get_many(references)
+    located = {reference: entry for reference, entry in entries.items() if entry[0]}
+    labels = await asyncio.to_thread(cache.get_labels, located, float("inf"))
+    pending = iter(list(labels))
+
+    stats = {
+        "references": len(references),
+        "missing_in_catalog": len(references) - len(located),
+        "not_stored": len(located) - len(labels),
+        "checked": 0,
+        "updated": 0,
+        "failed": 0
+    }
+    changed, confirmed, content_changed = [], [], []
+    start = time.perf_counter()
+
+    # Pracownik pobierający kolejne indeksy ze wspólnej listy
+    async def worker(client):
+        for reference in pending:
+            url = located[reference][0]
+            try:
+                updated, content = await asyncio.wait_for(
+                    refresh_label(client, cache, url, labels[reference]), PRODUCT_TIMEOUT
+                )
+            except Exception as e:
+                print(f"Błąd podczas odświeżania ceny indeksu '{reference}': {type(e).__name__} {e}")
+                stats["failed"] += 1
+                continue
+
+            stats["checked"] += 1
+            if content:
+                content_changed.append(reference)
+                changed.append(reference)
+            elif updated is None:
+                confirmed.append(reference)
+            else:
+                await asyncio.to_thread(cache.put_label, reference, url, updated)
+                changed.append(reference)
+                stats["updated"] += 1
+
+    async with create_http_client() as client:
+        await asyncio.gather(*(worker(client) for _ in range(max(1, concurrency))))
+    await asyncio.to_thread(cache.touch_labels, confirmed)
+    await asyncio.to_thread(cache.invalidate_many, (), content_changed)
+
+    elapsed = time.perf_counter() - start
+    stats["content_changed"] = len(content_changed)
+    stats["seconds"] = round(elapsed, 3)
+    stats["labels_per_second"] = round(stats["checked"] / elapsed, 2) if elapsed else 0.0
+    if content_changed:
+        print(f"Zmieniła się nazwa lub opis {len(content_changed)} produktów - ich etykiety usunięto z magazynu, "
+              f"przygotuje je generowanie lub: python prewarm.py --index-file <plik z indeksami>.")
+    order = {reference: position for position, reference in enumerate(references)}
+    return stats, sorted(changed, key=order.get)
+
+
+# Ponowne renderowanie tylko tych plików PDF z katalogu wynikowego cli.py, na których są zmienione etykiety.
+# Dane etykiet pochodzą z magazynu; plik, dla którego brakuje w magazynie którejś z jego etykiet (indeksy pliku
+# bez pominiętych przy generowaniu), oznaczany jest w manifeście jako nieaktualny i zostanie wygenerowany
+# przy następnym uruchomieniu cli.py z tymi samymi indeksami.
+def rerender_changed(output_dir, references, workers):
+    manifest = load_manifest(output_dir)
+    changed = set(references)
+    affected = [
+        (file_name, entry) for file_name, entry in sorted(manifest["chunks"].items())
+        if entry.get("status") == "done" and not changed.isdisjoint(entry["indices"])
+    ]
+    stats = {"files_affected": len(affected), "files_rendered": 0, "files_stale": 0, "sheets_changed": 0,
+             "changed_pages": {}}
+    if not affected:
+        return stats
+
+    cache = get_cache()
+    entries = get_catalog().get_many([reference for _, entry in affected for reference in entry["indices"]])
+    futures = {}
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(affected))), mp_context=RENDER_CONTEXT) as executor:
+        for file_name, entry in affected:
+            located = {reference: entries[reference] for reference in entry["indices"] if entries[reference][0]}
+            stored = cache.get_labels(located, max_age=float("inf"))
+            expected = [reference for reference in entry["indices"] if reference not in entry.get("failures", {})]
+            rendered = [reference for reference in expected if reference in stored]
+            if set(rendered) != set(expected):
+                print(f"Brak części etykiet pliku {file_name} w magazynie - plik zostanie wygenerowany przez cli.py.")
+                entry["status"] = "stale"
+                stats["files_stale"] += 1
+                continue
+
+            # Numery arkuszy (stron) pliku, na których zmieniła się co najmniej jedna etykieta
+            pages = sorted({
+                position // LABELS_PER_PAGE + 1 for position, reference in enumerate(rendered) if reference in changed
+            })
+            stats["changed_pages"][file_name] = pages
+            stats["sheets_changed"] += len(pages)
+            products = [stored[reference] for reference in rendered]
+            futures[file_name] = executor.submit(render_chunk, products, os.path.join(output_dir, file_name))
+
+        for file_name, future in futures.items():
+            try:
+                future.result()
+                stats["files_rendered"] += 1
+                print(f"Zapisano {file_name} (zmienione strony: {stats['changed_pages'][file_name]}).")
+            except Exception as e:
+                manifest["chunks"][file_name]["status"] = "failed"
+                manifest["chunks"][file_name]["error"] = str(e)
+                print(f"Błąd podczas renderowania {file_name}: {e}")
+
+    save_manifest(output_dir, manifest)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Szybkie odświeżenie cen etykiet zapisanych w magazynie (bez OpenAI i zdjęć).")
+    parser.add_argument("--index-file", help="odśwież tylko indeksy z pliku (domyślnie cały katalog)")
+    parser.add_argument("--output-dir", help="katalog wynikowy cli.py - ponownie renderowane są tylko pliki ze zmienionymi cenami")
+    parser.add_argument("--concurrency", type=int, default=PRICE_REFRESH_CONCURRENCY, help="liczba stron sprawdzanych jednocześnie")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="liczba procesów renderujących PDF")
+    args = parser.parse_args()
+
+    if args.index_file:
+        references = read_index_file(args.index_file)
+    elif args.output_dir:
+        references = [reference for entry in load_manifest(args.output_dir)["chunks"].values()
+                      for reference in entry["indices"]]
+    else:
+        references = get_catalog().references()
+
+    stats, changed = asyncio.run(refresh_prices(references, args.concurrency))
+    if args.output_dir:
+        start = time.perf_counter()
+        stats.update(rerender_changed(args.output_dir, changed, args.workers))
+        stats["render_seconds"] = round(time.perf_counter() - start, 3)
+    print(json.dumps(stats, indent=4))
+
+
+if __name__ == "__main__":
+    main()
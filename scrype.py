@@ -1,52 +1,118 @@
-import csv
-import requests
-from bs4 import BeautifulSoup
-import openai
+# Biblioteki HTTP, BeautifulSoup i OpenAI importowane są dopiero przy pierwszym użyciu (ich import trwa łącznie
+# ok. 1 s), więc aplikacja i skrypty, które tylko odczytują katalog lub gotowe etykiety, startują szybciej
 import re
 import asyncio
+import contextlib
+from functools import lru_cache
 import json
-from pdf import create_pdf_with_grid  # Import funkcji generującej PDF
+from pdf import LabelDocument, LABELS_PER_PAGE  # Import funkcji generujących PDF
+from assets import PRODUCT_IMAGE_WIDTH, get_product_image
+from catalog import get_catalog
+from cache import get_cache
+from summarizer import get_summary_service
+from tracing import span, trace
+from http_client import create_http_client, get_async, get_sync, RETRY_STATUSES
 import os
 from dotenv import load_dotenv
 
 load_dotenv()  # Wczytanie zmiennych z pliku .env
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 # Ścieżka do pliku tymczasowego JSON
 temp_json_path = "temp_product_data.json"
 
-# Funkcja do wczytywania URL z pliku CSV na podstawie indeksu
-import csv
-import os
+# Limit czasu (w sekundach) na pobranie i podsumowanie jednego produktu
+PRODUCT_TIMEOUT = float(os.getenv("PRODUCT_TIMEOUT", "60"))
+# Budżet czasu (w sekundach) na pobranie strony produktu (razem z ponowieniami), na podsumowanie opisu
+# i na pobranie zdjęcia. Po jego przekroczeniu etykieta powstaje w trybie awaryjnym: z ostatnich zapisanych
+# danych produktu, ze skróconego opisu ze strony zamiast podsumowania lub bez zdjęcia.
+# Suma budżetów powinna być mniejsza niż PRODUCT_TIMEOUT - inaczej zamiast etykiety w trybie awaryjnym
+# użyta zostanie ostatnia zapisana etykieta (lub indeks trafi do pominiętych).
+SHOP_BUDGET = float(os.getenv("SHOP_BUDGET", "20"))
+SUMMARY_BUDGET = float(os.getenv("SUMMARY_BUDGET", "20"))
+IMAGE_BUDGET = float(os.getenv("IMAGE_BUDGET", "10"))
+# Liczba słów opisu używanego zamiast podsumowania (jak limit w poleceniu dla OpenAI)
+FALLBACK_DESCRIPTION_WORDS = 47
+# Liczba stron etykiet, dla których dane produktów pobierane są jednocześnie
+BATCH_WINDOW_PAGES = int(os.getenv("BATCH_WINDOW_PAGES", "8"))
+
+# Parser HTML - lxml (szybszy, w C), a gdy nie jest zainstalowany, wbudowany html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Klasy elementów strony produktu, z których odczytujemy dane etykiety
+PRODUCT_CLASSES = {"product-detail-name", "current-price", "product-description", "product-additional-info"}
+
 
+# Funkcja wybierająca podczas parsowania tylko elementy z danymi produktu (reszta strony jest pomijana)
+def is_product_element(name, attrs):
+    classes = attrs.get("class") or ""
+    if isinstance(classes, str):
+        classes = classes.split()
+    return not PRODUCT_CLASSES.isdisjoint(classes)
 
+
+# Filtr parsowania tworzony przy pierwszym użyciu razem z importem BeautifulSoup
+@lru_cache(maxsize=None)
+def product_strainer():
+    from bs4 import SoupStrainer
+    return SoupStrainer(is_product_element)
+
+# Funkcja do wczytywania URL z katalogu na podstawie indeksu
 def get_url_from_csv(reference):
-    # Używamy ścieżki względnej od lokalizacji skryptu
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(current_dir, 'url_list2.csv')
+    return get_catalog().get(reference)
 
-    encodings = ['cp1250', 'utf-8', 'latin1', 'iso-8859-2']
 
-    for encoding in encodings:
-        try:
-            with open(file_path, newline='', encoding=encoding) as csvfile:
-                reader = csv.DictReader(csvfile, delimiter=';')
-                for row in reader:
-                    if row['reference'] == reference:
-                        return row['Url'], row['Pic_url']
-        except UnicodeDecodeError:
-            continue
-        except Exception as e:
-            print(f"Błąd podczas odczytu pliku z kodowaniem {encoding}: {e}")
-            continue
-    return None, None
+# Funkcja do wczytywania URL dla wielu indeksów naraz
+def get_urls_from_csv(references):
+    return get_catalog().get_many(references)
 
 # Funkcja do pobierania danych o produkcie ze strony
 def fetch_product_info(url):
-    response = requests.get(url)
-    html = response.content
-    soup = BeautifulSoup(html, 'html.parser')
+    response = get_sync(url)
+    if response.status_code in RETRY_STATUSES:
+        response.raise_for_status()
+    return parse_product_page(response.content)
+
+
+# Funkcja budująca nagłówki zapytania warunkowego na podstawie zapisanej wersji strony
+def conditional_headers(etag, last_modified):
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+# Asynchroniczna wersja pobierania danych o produkcie (parsowanie w osobnym wątku).
+# stale to zapisana wersja strony (dane, etag, last_modified) - gdy sklep odpowie 304, strona nie jest pobierana.
+# Zwraca (dane, etag, last_modified, czy_strona_się_zmieniła). Przeciążenie lub awaria sklepu (429/5xx po
+# wszystkich ponowieniach) zgłaszane jest jako błąd, a nie odczytywane jako strona bez produktu.
+async def fetch_product_info_async(client, url, stale=None):
+    headers = conditional_headers(*stale[1:]) if stale else {}
+    with span("shop_fetch"):
+        response = await get_async(client, url, headers=headers)
+    if response.status_code in RETRY_STATUSES:
+        response.raise_for_status()
+    if response.status_code == 304 and stale:
+        return stale[0], stale[1], stale[2], False
+
+    info = await asyncio.to_thread(parse_product_page, response.content)
+    return info, response.headers.get("ETag"), response.headers.get("Last-Modified"), True
 
+
+# Funkcja wyciągająca dane o produkcie z kodu HTML strony (parsowany jest tylko obszar z danymi produktu)
+def parse_product_page(html):
+    from bs4 import BeautifulSoup
+    with span("parse"):
+        return extract_product_info(BeautifulSoup(html, HTML_PARSER, parse_only=product_strainer()))
+
+
+# Funkcja odczytująca pola etykiety z drzewa strony
+def extract_product_info(soup):
     try:
         product_name = soup.find('h1', class_='h1 product-detail-name').text.strip()
     except AttributeError:
@@ -77,56 +143,231 @@ def fetch_product_info(url):
 
     return product_name, product_price, description, producer_name, index_value
 
-# Funkcja do skracania opisu przy użyciu API OpenAI
+# Funkcja do skracania opisu przy użyciu API OpenAI (zapytania łączone w paczki przez SummaryService)
 async def summarize_description(description, temperature=0.3):
-    prompt = f"Proszę podsumuj poniższy opis produktu w zwięzły i logiczny sposób, nie przekraczając 47 słów. Odpowiedź wygeneruj w języku polskim:\n\n{description}"
-
-    completion = await openai.ChatCompletion.acreate(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "Jesteś asystentem, który skraca opisy produktów."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=temperature
-    )
-
-    summary = completion.choices[0].message['content'].strip()
-    return summary
-
-# Funkcja generująca PDF i JSON z listą indeksów
-async def generate_pdf_from_indices(indices, output_pdf_path="products.pdf"):
-    products_data = []
+    return await get_summary_service(temperature).summarize(description)
+
+
+# Podsumowanie opisu w budżecie czasu SUMMARY_BUDGET. Po jego przekroczeniu zapytanie nie jest przerywane -
+# jeśli zakończy się, zanim zamknięta zostanie pętla zdarzeń, podsumowanie trafi do pamięci podręcznej.
+# Dotyczy to stale działającej pętli kolejki zadań (jobs.py) i długich partii; w cli.py, prewarm.py
+# i benchmarkach asyncio.run anuluje zapytania niezakończone do końca generowania.
+async def summarize_within_budget(url, description):
+    task = asyncio.ensure_future(summarize_description(description))
+
+    def store(task):
+        if not task.cancelled() and task.exception() is None:
+            asyncio.get_running_loop().run_in_executor(None, get_cache().put_summary, url, description, task.result())
+
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), SUMMARY_BUDGET)
+    except asyncio.TimeoutError:
+        task.add_done_callback(store)
+        raise
+
+
+# Funkcja skracająca opis ze strony do FALLBACK_DESCRIPTION_WORDS słów (etykieta bez podsumowania z OpenAI)
+def truncate_description(description, words=FALLBACK_DESCRIPTION_WORDS):
+    parts = description.split()
+    return " ".join(parts[:words]) + ("..." if len(parts) > words else "")
+
+
+# Funkcja pobierająca i podsumowująca dane jednego produktu. Gdy sklep lub OpenAI nie odpowiadają w budżecie
+# czasu, etykieta powstaje z ostatnich zapisanych danych lub skróconego opisu, a lista "degraded" etykiety
+# podaje, które dane zostały zastąpione (product, summary, image). Przy błędzie sieci get_product_image używa
+# ostatniej zapisanej wersji zdjęcia; gdy pobieranie nie zmieści się w IMAGE_BUDGET, etykieta jest drukowana
+# bez zdjęcia (pobieranie kończy się w tle i zdjęcie trafia na dysk na następne generowanie).
+async def process_product(client, url, pic_url):
+    cache = get_cache()
+    degraded = []
 
+    info = cache.get_product(url)
+    if info is None:
+        try:
+            info, etag, last_modified, modified = await asyncio.wait_for(
+                fetch_product_info_async(client, url, cache.get_validators(url)), SHOP_BUDGET
+            )
+        except Exception as e:
+            info = cache.get_product(url, max_age=float("inf"))
+            if info is None:
+                raise
+            print(f"Sklep nie odpowiada ({type(e).__name__}) - użyto ostatnich zapisanych danych {url}.")
+            degraded.append("product")
+        else:
+            if not modified:
+                await asyncio.to_thread(cache.touch_product, url)
+            # Nie zapamiętujemy stron, z których nie udało się odczytać produktu
+            elif info[0] != "Brak nazwy produktu":
+                await asyncio.to_thread(cache.put_product, url, info, etag, last_modified)
+    name, price, description, producer, index = info
+
+    short_desc = cache.get_summary(url, description)
+    if short_desc is None:
+        try:
+            with span("openai_summary"):
+                short_desc = await summarize_within_budget(url, description)
+            await asyncio.to_thread(cache.put_summary, url, description, short_desc)
+        except Exception as e:
+            print(f"Brak podsumowania z OpenAI ({type(e).__name__}) - użyto skróconego opisu {url}.")
+            short_desc = truncate_description(description)
+            degraded.append("summary")
+
+    # Wstępne pobranie zdjęcia, aby renderowanie strony nie czekało na sieć. Zdjęcie, którego nie udało się
+    # pobrać (limit czasu, błąd sklepu), jest pomijane - renderowanie nie próbuje pobrać go ponownie.
+    if pic_url:
+        try:
+            with span("image_download"):
+                image = await asyncio.wait_for(
+                    asyncio.to_thread(get_product_image, pic_url, PRODUCT_IMAGE_WIDTH), IMAGE_BUDGET
+                )
+        except asyncio.TimeoutError:
+            print(f"Zdjęcie nie zostało pobrane w {IMAGE_BUDGET:.0f} s - etykieta bez zdjęcia {url}.")
+            image = None
+        if image is None:
+            pic_url = ""
+            degraded.append("image")
+
+    label = {
+        "name": name,
+        "price": price,
+        "description": description,
+        "summary_description": short_desc,
+        "producer": producer,
+        "index": index,
+        "image_url": pic_url,
+        "product_url": url
+    }
+    if degraded:
+        label["degraded"] = degraded
+    return label
+
+
+# Funkcja zwracająca dane etykiety z lokalnego magazynu lub pobierająca je na żywo (i zapisująca w magazynie).
+# Etykiety w trybie awaryjnym nie są zapisywane; gdy produktu nie da się przygotować w PRODUCT_TIMEOUT,
+# używana jest ostatnia zapisana etykieta, także przeterminowana.
+async def load_label(client, reference, url, pic_url, stored):
+    label = stored.get(reference)
+    if label is None:
+        try:
+            label = await asyncio.wait_for(process_product(client, url, pic_url), PRODUCT_TIMEOUT)
+        except Exception as e:
+            stored = await asyncio.to_thread(get_cache().get_labels, {reference: (url, pic_url)}, float("inf"))
+            label = stored.get(reference)
+            if label is None:
+                raise
+            print(f"Użyto ostatniej zapisanej etykiety indeksu '{reference}' ({type(e).__name__}).")
+            return dict(label, degraded=["label"])
+        if label["name"] != "Brak nazwy produktu" and not label.get("degraded"):
+            await asyncio.to_thread(get_cache().put_label, reference, url, label)
+    return label
+
+
+# Funkcja przetwarzająca równolegle fragment listy indeksów; błędy trafiają do słownika failures.
+# progress (opcjonalnie) jest wywoływane po zakończeniu każdego indeksu - także nieudanego.
+# degraded (opcjonalnie) - słownik indeks -> lista danych zastąpionych w trybie awaryjnym.
+async def process_products(client, indices, catalog_entries, failures, progress=None, degraded=None):
+    # Etykiety przygotowane wcześniej (prewarm.py) nie wymagają pobierania ani podsumowania
+    with span("label_store"):
+        stored = await asyncio.to_thread(get_cache().get_labels, {
+            reference: catalog_entries[reference] for reference in indices if catalog_entries[reference][0]
+        })
+
+    references = []
+    tasks = []
     for reference in indices:
-        url, pic_url = get_url_from_csv(reference)
+        url, pic_url = catalog_entries[reference]
 
         if url:
-            name, price, description, producer, index = fetch_product_info(url)
-            short_desc = await summarize_description(description)
-
-            products_data.append({
-                "name": name,
-                "price": price,
-                "description": description,
-                "summary_description": short_desc,
-                "producer": producer,
-                "index": index,
-                "image_url": pic_url,
-                "product_url": url
-            })
+            references.append(reference)
+            task = asyncio.ensure_future(load_label(client, reference, url, pic_url, stored))
+            if progress:
+                task.add_done_callback(lambda _: progress())
+            tasks.append(task)
         else:
             print(f"Indeks '{reference}' nie został znaleziony w CSV.")
+            failures[reference] = "Indeks nie został znaleziony w katalogu"
+            if progress:
+                progress()
+
+    # Produkty przetwarzane są równolegle, a wyniki zachowują kolejność indeksów
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    products_data = []
+    for reference, result in zip(references, results):
+        if isinstance(result, asyncio.TimeoutError):
+            print(f"Przekroczono limit czasu dla indeksu '{reference}'.")
+            failures[reference] = "Przekroczono limit czasu"
+        elif isinstance(result, Exception):
+            print(f"Błąd podczas przetwarzania indeksu '{reference}': {result}")
+            failures[reference] = f"Błąd: {result}"
+        else:
+            products_data.append(result)
+            if degraded is not None and result.get("degraded"):
+                degraded[reference] = result["degraded"]
+    return products_data
 
-    if products_data:
-        with open("temp_product_data.json", "w", encoding="utf-8") as f:
-            json.dump(products_data, f, ensure_ascii=False, indent=4)
 
-        # Utwórz plik PDF z unikalną nazwą
-        create_pdf_with_grid(products_data, output_file=output_pdf_path)
-        return f"PDF utworzony jako '{output_pdf_path}'. Plik JSON został zapisany jako 'temp_product_data.json'."
-    else:
-        return "Nie udało się znaleźć produktów dla podanych indeksów."
+# Funkcja generująca PDF z listą indeksów (po 4 etykiety na stronę A4) i opcjonalnie plik JSON z danymi etykiet.
+# Gdy output_pdf_path jest None, dokument nie jest zapisywany na dysk, a jego bajty trafiają do wyniku ("data").
+# json_path - ścieżka pliku JSON z danymi etykiet (domyślnie nie jest zapisywany, np. dla zadań z jobs.py).
+# client pozwala użyć wspólnego klienta HTTP (np. kolejki zadań w jobs.py), progress - patrz process_products.
+async def generate_pdf_from_indices(indices, output_pdf_path="products.pdf", progress=None, client=None,
+                                    json_path=None):
+    # Pomiary etapów trafiają do przebiegu "generate_pdf" (podgląd w panelu diagnostycznym aplikacji)
+    with trace("generate_pdf", indices=len(indices)) as current:
+        with span("catalog_lookup"):
+            catalog_entries = get_urls_from_csv(indices)
+        failures = {}
+        degraded = {}
+        products_data = []
+
+        # Przy dużych partiach gotowe strony zapisywane są fragmentami na dysk (limit PDF_MEMORY_MB w pdf.py)
+        pdf = LabelDocument()
+        page_products = []
+        window = BATCH_WINDOW_PAGES * LABELS_PER_PAGE
+
+        async with (contextlib.nullcontext(client) if client else create_http_client()) as client:
+            # Indeksy przetwarzamy oknami, a gotowe strony od razu trafiają do dokumentu.
+            # Renderowanie odbywa się w wątku, aby nie wstrzymywać pobierania innych zadań w tej samej pętli.
+            for start in range(0, len(indices), window):
+                with span("fetch_products"):
+                    products = await process_products(
+                        client, indices[start:start + window], catalog_entries, failures, progress, degraded
+                    )
+                for product in products:
+                    products_data.append(product)
+                    page_products.append(product)
+                    if len(page_products) == LABELS_PER_PAGE:
+                        await asyncio.to_thread(pdf.add_page, page_products)
+                        page_products = []
+
+        if page_products:
+            await asyncio.to_thread(pdf.add_page, page_products)
+
+        if products_data:
+            pdf_data = await asyncio.to_thread(pdf.close, output_pdf_path)
+            target = f"jako '{output_pdf_path}'" if output_pdf_path else "w pamięci"
+            message = f"PDF utworzony {target}."
+            if json_path:
+                with open(json_path, "w", encoding="utf-8") as f:
+                    json.dump(products_data, f, ensure_ascii=False, indent=4)
+                message += f" Plik JSON został zapisany jako '{json_path}'."
+        else:
+            output_pdf_path = None
+            pdf_data = None
+            message = "Nie udało się znaleźć produktów dla podanych indeksów."
+
+        return {
+            "message": message,
+            "pdf": output_pdf_path,
+            "data": pdf_data,
+            "labels": len(products_data),
+            "pages": pdf.page,
+            "failures": failures,
+            "degraded": degraded,
+            "trace_id": current["id"]
+        }
 
 # Uruchomienie programu
 if __name__ == "__main__":
-    asyncio.run(generate_pdf_from_indices(["12345"]))
+    asyncio.run(generate_pdf_from_indices(["12345"], json_path=temp_json_path))
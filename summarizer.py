@@ -0,0 +1,269 @@
+import asyncio
+import json
+import os
+import random
+import time
+import weakref
+
+from cache import description_hash
+from http_client import CircuitOpenError, get_breaker
+from tracing import span
+
+# Model i parametry zapytań o podsumowania
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4o-mini")
+SYSTEM_PROMPT = "Jesteś asystentem, który skraca opisy produktów."
+# Maksymalna liczba równoległych zapytań do OpenAI
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "4"))
+# Maksymalna liczba opisów w jednym zapytaniu wsadowym i ich łączna długość (w znakach)
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "8"))
+SUMMARY_BATCH_CHARS = int(os.getenv("SUMMARY_BATCH_CHARS", "24000"))
+# Czas (w sekundach) oczekiwania na kolejne opisy przed wysłaniem niepełnej paczki
+SUMMARY_BATCH_WAIT = float(os.getenv("SUMMARY_BATCH_WAIT", "0.05"))
+# Liczba ponownych prób po przekroczeniu limitu zapytań lub błędzie serwera
+SUMMARY_MAX_RETRIES = int(os.getenv("SUMMARY_MAX_RETRIES", "6"))
+# Maksymalna przerwa (w sekundach) między próbami
+SUMMARY_MAX_BACKOFF = float(os.getenv("SUMMARY_MAX_BACKOFF", "60"))
+
+
+# Funkcja zwracająca moduł OpenAI - import (kilkaset ms) odkładany jest do pierwszego zapytania,
+# a klucz API odczytywany ze zmiennych środowiskowych (wczytanych wcześniej także z pliku .env)
+def openai_module():
+    import openai
+    openai.api_key = os.getenv("OPENAI_API_KEY")
+    return openai
+
+
+# Funkcja budująca polecenie dla pojedynczego opisu
+def single_prompt(description):
+    return f"Proszę podsumuj poniższy opis produktu w zwięzły i logiczny sposób, nie przekraczając 47 słów. Odpowiedź wygeneruj w języku polskim:\n\n{description}"
+
+
+# Funkcja budująca polecenie dla wielu opisów naraz (odpowiedź w formacie JSON)
+def batch_prompt(descriptions):
+    items = [{"id": i, "text": description} for i, description in enumerate(descriptions)]
+    return (
+        "Proszę podsumuj każdy z poniższych opisów produktów osobno, w zwięzły i logiczny sposób, "
+        "nie przekraczając 47 słów na opis. Podsumowania wygeneruj w języku polskim. "
+        "Odpowiedz wyłącznie obiektem JSON w postaci "
+        '{"summaries": [{"id": <id opisu>, "summary": "<podsumowanie>"}]}.\n\n'
+        + json.dumps(items, ensure_ascii=False)
+    )
+
+
+# Zapytanie o podsumowanie jednego opisu
+async def request_summary(description, temperature=0.3):
+    openai = openai_module()
+    completion = await openai.ChatCompletion.acreate(
+        model=SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": single_prompt(description)}
+        ],
+        temperature=temperature
+    )
+    return completion.choices[0].message['content'].strip()
+
+
+# Zapytanie o podsumowania wielu opisów; zwraca słownik id -> podsumowanie (może być niepełny).
+# Opisy, których id wróciło w odpowiedzi więcej niż raz, są pomijane - nie wiadomo, które podsumowanie jest właściwe.
+async def request_summaries(descriptions, temperature=0.3):
+    openai = openai_module()
+    completion = await openai.ChatCompletion.acreate(
+        model=SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": batch_prompt(descriptions)}
+        ],
+        temperature=temperature,
+        response_format={"type": "json_object"}
+    )
+    try:
+        payload = json.loads(completion.choices[0].message['content'])
+        items = payload["summaries"]
+    except (ValueError, KeyError, TypeError):
+        return {}
+
+    summaries = {}
+    duplicates = set()
+    for item in items:
+        try:
+            item_id = int(item["id"])
+            summary = str(item["summary"]).strip()
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 0 <= item_id < len(descriptions) and summary:
+            if item_id in summaries:
+                duplicates.add(item_id)
+            summaries[item_id] = summary
+    for item_id in duplicates:
+        del summaries[item_id]
+    return summaries
+
+
+# Funkcja sprawdzająca, czy błąd OpenAI jest przejściowy i warto ponowić zapytanie
+def is_retryable(error):
+    openai = openai_module()
+    if isinstance(error, (openai.error.RateLimitError, openai.error.ServiceUnavailableError,
+                          openai.error.Timeout, openai.error.APIConnectionError, openai.error.TryAgain)):
+        return True
+    if isinstance(error, openai.error.APIError):
+        return (error.http_status or 500) >= 500
+    return isinstance(error, asyncio.TimeoutError)
+
+
+# Usługa podsumowań: łączy identyczne opisy w locie, pakuje opisy w paczki i dostosowuje tempo do limitów
+class SummaryService:
+    def __init__(self, temperature=0.3, concurrency=OPENAI_CONCURRENCY, batch_size=SUMMARY_BATCH_SIZE,
+                 batch_chars=SUMMARY_BATCH_CHARS, batch_wait=SUMMARY_BATCH_WAIT):
+        self.temperature = temperature
+        self.batch_size = batch_size
+        self.batch_chars = batch_chars
+        self.batch_wait = batch_wait
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._inflight = {}
+        self._queue = []
+        self._flush_handle = None
+        self._tasks = set()
+        # Wspólna przerwa po przekroczeniu limitu - rośnie przy błędach 429 i maleje po sukcesach
+        self._backoff = 0.0
+        self._paused_until = 0.0
+        self.stats = {"requests": 0, "batched_requests": 0, "descriptions": 0, "coalesced": 0, "retries": 0}
+
+    async def summarize(self, description):
+        key = description_hash(description)
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self._queue.append((key, description, future))
+        self.stats["descriptions"] += 1
+        self._schedule_flush()
+        return await asyncio.shield(future)
+
+    def _schedule_flush(self):
+        if len(self._queue) >= self.batch_size or sum(len(d) for _, d, _ in self._queue) >= self.batch_chars:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_wait, self._flush)
+
+    # Wysłanie oczekujących opisów w paczkach nie większych niż batch_size / batch_chars
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        while self._queue:
+            batch, chars = [], 0
+            while self._queue and len(batch) < self.batch_size:
+                length = len(self._queue[0][1])
+                if batch and chars + length > self.batch_chars:
+                    break
+                batch.append(self._queue.pop(0))
+                chars += length
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    # Podsumowanie paczki opisów. Opisy pominięte lub zdublowane w odpowiedzi wsadowej, a także wszystkie opisy
+    # paczki odrzuconej przez API (np. zbyt duże zapytanie, brak obsługi response_format), podsumowywane są
+    # pojedynczo; błąd jednego opisu trafia tylko do jego oczekujących.
+    async def _run_batch(self, batch):
+        try:
+            descriptions = [description for _, description, _ in batch]
+            results = {}
+            if len(batch) > 1:
+                try:
+                    results = await self._call(request_summaries, descriptions, self.temperature)
+                    self.stats["batched_requests"] += 1
+                except Exception as e:
+                    # Przekroczone limity i niedostępne API dotyczą tak samo zapytań pojedynczych
+                    if is_retryable(e) or isinstance(e, CircuitOpenError):
+                        raise
+                    print(f"Zapytanie wsadowe OpenAI odrzucone ({type(e).__name__}: {e}) - ponowienie pojedynczo.")
+
+            missing = [i for i in range(len(batch)) if i not in results]
+            if results and missing:
+                print(f"Odpowiedź wsadowa OpenAI bez {len(missing)} z {len(batch)} podsumowań - "
+                      f"ponowienie pojedynczo.")
+            singles = await asyncio.gather(
+                *(self._call(request_summary, descriptions[i], self.temperature) for i in missing),
+                return_exceptions=True
+            )
+            results.update(zip(missing, singles))
+
+            for i, (_, _, future) in enumerate(batch):
+                if future.done():
+                    continue
+                if isinstance(results[i], BaseException):
+                    future.set_exception(results[i])
+                else:
+                    future.set_result(results[i])
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        except BaseException:
+            for _, _, future in batch:
+                future.cancel()
+            raise
+        finally:
+            for key, _, _ in batch:
+                self._inflight.pop(key, None)
+
+    # Oczekiwanie na koniec wspólnej przerwy po przekroczeniu limitu (może zostać wydłużona w trakcie)
+    async def _wait_for_pause(self):
+        while True:
+            delay = self._paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    # Wywołanie API z ograniczeniem współbieżności i adaptacyjnym wycofaniem przy limitach.
+    # Przerwa przed ponowieniem odczekiwana jest bez zajmowania miejsca w puli zapytań.
+    # Awarie serwera i sieci (bez przekroczeń limitu) liczy bezpiecznik hosta API - gdy jest otwarty,
+    # zapytania kończą się od razu błędem, a etykiety dostają skrócony opis (scrype.process_product).
+    async def _call(self, request, *args):
+        openai = openai_module()
+        breaker = get_breaker(openai.api_base)
+        for attempt in range(SUMMARY_MAX_RETRIES + 1):
+            await self._wait_for_pause()
+            async with self._semaphore:
+                if not breaker.allow():
+                    raise CircuitOpenError(f"Host {breaker.host} chwilowo nie odpowiada")
+                try:
+                    self.stats["requests"] += 1
+                    with span("openai_request", request=request.__name__):
+                        result = await request(*args)
+                    breaker.success()
+                    self._backoff = self._backoff / 2 if self._backoff > 0.5 else 0.0
+                    return result
+                except Exception as e:
+                    if is_retryable(e) and not isinstance(e, openai.error.RateLimitError):
+                        breaker.failure()
+                    if attempt == SUMMARY_MAX_RETRIES or not is_retryable(e):
+                        raise
+                    self.stats["retries"] += 1
+                    self._backoff = min(SUMMARY_MAX_BACKOFF, max(1.0, self._backoff * 2))
+                    retry_after = getattr(e, "headers", None) or {}
+                    try:
+                        wait = max(float(retry_after.get("retry-after", 0)), self._backoff)
+                    except (TypeError, ValueError):
+                        wait = self._backoff
+                    wait *= random.uniform(0.8, 1.2)
+                    self._paused_until = max(self._paused_until, time.monotonic() + wait)
+                    print(f"Limit zapytań OpenAI ({type(e).__name__}), ponowienie za {wait:.1f} s.")
+
+
+_services = weakref.WeakKeyDictionary()
+
+
+# Funkcja zwracająca usługę podsumowań dla bieżącej pętli zdarzeń
+def get_summary_service(temperature=0.3):
+    loop = asyncio.get_running_loop()
+    services = _services.setdefault(loop, {})
+    if temperature not in services:
+        services[temperature] = SummaryService(temperature=temperature)
+    return services[temperature]
@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Plik, do którego dopisywane są wszystkie pomiary w formacie JSON Lines (puste = brak zapisu)
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+# Liczba ostatnich przebiegów (np. generowań PDF) przechowywanych do podglądu w aplikacji
+TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", "20"))
+# Maksymalna liczba pomiarów zapamiętanych w jednym przebiegu (statystyki etapów liczone są zawsze)
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "5000"))
+# Liczba ostatnich czasów każdego etapu używana do wyznaczenia percentyli
+STAGE_SAMPLES = 1000
+
+# Granice przedziałów histogramu (w sekundach) w formacie Prometheus
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_trace = ContextVar("current_trace", default=None)
+
+
+# Funkcja wyznaczająca percentyl z listy czasów
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# Zbieranie czasów etapów: statystyki dla całego procesu, historia przebiegów i opcjonalny zapis JSONL
+class Tracer:
+    def __init__(self, trace_file=TRACE_FILE, history=TRACE_HISTORY, buckets=BUCKETS):
+        self.trace_file = trace_file
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._traces = deque(maxlen=history)
+        self._file = None
+
+    def record(self, name, duration, attrs=None, trace=None):
+        with self._lock:
+            stage = self._stages.get(name)
+            if stage is None:
+                stage = self._stages[name] = {
+                    "count": 0, "sum": 0.0, "max": 0.0,
+                    "buckets": [0] * len(self.buckets), "samples": deque(maxlen=STAGE_SAMPLES)
+                }
+            stage["count"] += 1
+            stage["sum"] += duration
+            stage["max"] = max(stage["max"], duration)
+            stage["samples"].append(duration)
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    stage["buckets"][i] += 1
+
+            if trace is not None:
+                if len(trace["spans"]) < TRACE_MAX_SPANS:
+                    trace["spans"].append({
+                        "name": name,
+                        "start_ms": round((time.perf_counter() - duration - trace["start"]) * 1000, 2),
+                        "duration_ms": round(duration * 1000, 2),
+                        **(attrs or {})
+                    })
+                else:
+                    trace["dropped_spans"] += 1
+
+            if self.trace_file:
+                self._write_line({
+                    "ts": time.time(),
+                    "trace_id": trace["id"] if trace else None,
+                    "name": name,
+                    "duration_ms": round(duration * 1000, 3),
+                    **(attrs or {})
+                })
+
+    def _write_line(self, entry):
+        try:
+            if self._file is None:
+                self._file = open(self.trace_file, 'a', encoding='utf-8', buffering=1)
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"Błąd zapisu pomiarów do {self.trace_file}: {e}")
+            self.trace_file = ""
+
+    def finish_trace(self, trace):
+        with self._lock:
+            self._traces.append(trace)
+
+    # Statystyki etapów: liczba, suma, średnia, p50, p95 i maksimum (w ms)
+    def stage_stats(self):
+        with self._lock:
+            stages = {name: (stage["count"], stage["sum"], stage["max"], list(stage["samples"]))
+                      for name, stage in self._stages.items()}
+        return [
+            {
+                "stage": name,
+                "count": count,
+                "total_ms": round(total * 1000, 1),
+                "mean_ms": round(total / count * 1000, 2),
+                "p50_ms": round(percentile(samples, 0.5) * 1000, 2),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+                "max_ms": round(maximum * 1000, 2)
+            }
+            for name, (count, total, maximum, samples) in sorted(stages.items())
+        ]
+
+    # Ostatnie przebiegi (najnowszy pierwszy)
+    def recent_traces(self):
+        with self._lock:
+            return list(reversed(self._traces))
+
+    # Metryki w formacie tekstowym Prometheus (histogram czasów etapów)
+    def prometheus(self, metric="label_stage_duration_seconds"):
+        lines = [
+            f"# HELP {metric} Czas trwania etapów generowania etykiet.",
+            f"# TYPE {metric} histogram"
+        ]
+        with self._lock:
+            for name, stage in sorted(self._stages.items()):
+                for bound, count in zip(self.buckets, stage["buckets"]):
+                    lines.append(f'{metric}_bucket{{stage="{name}",le="{bound}"}} {count}')
+                lines.append(f'{metric}_bucket{{stage="{name}",le="+Inf"}} {stage["count"]}')
+                lines.append(f'{metric}_sum{{stage="{name}"}} {stage["sum"]:.6f}')
+                lines.append(f'{metric}_count{{stage="{name}"}} {stage["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._traces.clear()
+
+
+_tracer = Tracer()
+
+
+# Funkcja zwracająca wspólny obiekt pomiarów (jeden na proces)
+def get_tracer():
+    return _tracer
+
+
+# Pomiar czasu jednego etapu; działa także w kodzie asynchronicznym i w wątkach (asyncio.to_thread)
+@contextmanager
+def span(name, **attrs):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _tracer.record(name, time.perf_counter() - start, attrs, _current_trace.get())
+
+
+# Przebieg grupujący pomiary jednego zadania (np. jednego generowania PDF) do podglądu w aplikacji
+@contextmanager
+def trace(name, **attrs):
+    current = {
+        "id": uuid.uuid4().hex[:12],
+        "name": name,
+        "started_at": time.time(),
+        "start": time.perf_counter(),
+        "spans": [],
+        "dropped_spans": 0,
+        **attrs
+    }
+    token = _current_trace.set(current)
+    try:
+        with span(name):
+            yield current
+    finally:
+        _current_trace.reset(token)
+        current["duration_ms"] = round((time.perf_counter() - current["start"]) * 1000, 2)
+        _tracer.finish_trace(current)
+
+
+# Podsumowanie przebiegu według etapów: liczba pomiarów i łączny czas (etapy współbieżne mogą przekraczać czas całości)
+def summarize_trace(current):
+    stages = {}
+    for item in current["spans"]:
+        count, total = stages.get(item["name"], (0, 0.0))
+        stages[item["name"]] = (count + 1, total + item["duration_ms"])
+    return [
+        {"stage": name, "count": count, "total_ms": round(total, 1), "mean_ms": round(total / count, 2)}
+        for name, (count, total) in sorted(stages.items(), key=lambda entry: -entry[1][1])
+    ]